@@ -34,3 +34,65 @@ table_mongo_url = os.getenv('TABLE_MONGO_URL', '')
 table_db_name = os.getenv('TABLE_DB_NAME', '')
 bland_api_key = os.getenv('BLAND_API_KEY', '')
 hack_service = os.getenv('HACK_SERVICE', '')
+http_max_connections = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+http_max_keepalive_connections = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+http_keepalive_expiry = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+http_connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+http_read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+http2_enabled = os.getenv('HTTP2_ENABLED', 'true') == 'true'
+http_upstreams = os.getenv('HTTP_UPSTREAMS', '')
+connector_config_ttl = int(os.getenv('CONNECTOR_CONFIG_TTL', '300'))
+connector_config_cache_size = int(os.getenv('CONNECTOR_CONFIG_CACHE_SIZE', '256'))
+ticket_summary_concurrency = int(os.getenv('TICKET_SUMMARY_CONCURRENCY', '8'))
+member_pipeline_concurrency = int(os.getenv('MEMBER_PIPELINE_CONCURRENCY', '5'))
+member_pipeline_timeout = float(os.getenv('MEMBER_PIPELINE_TIMEOUT', '300'))
+jira_users_page_size = int(os.getenv('JIRA_USERS_PAGE_SIZE', '100'))
+jira_user_bulk_batch_size = int(os.getenv('JIRA_USER_BULK_BATCH_SIZE', '50'))
+jira_request_concurrency = int(os.getenv('JIRA_REQUEST_CONCURRENCY', '4'))
+jira_search_page_size = int(os.getenv('JIRA_SEARCH_PAGE_SIZE', '50'))
+jira_assignee_chunk_size = int(os.getenv('JIRA_ASSIGNEE_CHUNK_SIZE', '25'))
+jira_issue_cache_size = int(os.getenv('JIRA_ISSUE_CACHE_SIZE', '2048'))
+jira_issue_cache_ttl = int(os.getenv('JIRA_ISSUE_CACHE_TTL', '86400'))
+jira_roster_cache_size = int(os.getenv('JIRA_ROSTER_CACHE_SIZE', '64'))
+jira_roster_ttl = int(os.getenv('JIRA_ROSTER_TTL', '600'))
+llm_cache_enabled = os.getenv('LLM_CACHE_ENABLED', 'true') == 'true'
+llm_cache_ttl = int(os.getenv('LLM_CACHE_TTL', '86400'))
+llm_cache_size = int(os.getenv('LLM_CACHE_SIZE', '1024'))
+llm_requests_per_minute = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '300'))
+llm_tokens_per_minute = int(os.getenv('LLM_TOKENS_PER_MINUTE', '150000'))
+llm_rate_limits = os.getenv('LLM_RATE_LIMITS', '')
+ticket_summary_batching = os.getenv('TICKET_SUMMARY_BATCHING', 'true') == 'true'
+ticket_summary_batch_tokens = int(os.getenv('TICKET_SUMMARY_BATCH_TOKENS', '12000'))
+llm_usage_enabled = os.getenv('LLM_USAGE_ENABLED', 'true') == 'true'
+llm_usage_queue_size = int(os.getenv('LLM_USAGE_QUEUE_SIZE', '10000'))
+llm_usage_batch_size = int(os.getenv('LLM_USAGE_BATCH_SIZE', '100'))
+llm_usage_flush_interval = float(os.getenv('LLM_USAGE_FLUSH_INTERVAL', '5'))
+llm_max_retries = int(os.getenv('LLM_MAX_RETRIES', '2'))
+llm_retry_base_delay = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+llm_retry_max_delay = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+llm_request_timeout = float(os.getenv('LLM_REQUEST_TIMEOUT', '120'))
+llm_hedge_after = float(os.getenv('LLM_HEDGE_AFTER', '0'))
+llm_fallback_models = os.getenv('LLM_FALLBACK_MODELS', '')
+chat_compaction_queue_size = int(os.getenv('CHAT_COMPACTION_QUEUE_SIZE', '1000'))
+chat_compaction_workers = int(os.getenv('CHAT_COMPACTION_WORKERS', '2'))
+chat_history_max_entries = int(os.getenv('CHAT_HISTORY_MAX_ENTRIES', '100'))
+chat_history_window = int(os.getenv('CHAT_HISTORY_WINDOW', '20'))
+chat_history_ttl = int(os.getenv('CHAT_HISTORY_TTL', '604800'))
+prompt_budgets = os.getenv('PROMPT_BUDGETS', '')
+name_index_ttl = int(os.getenv('NAME_INDEX_TTL', '600'))
+name_index_cache_size = int(os.getenv('NAME_INDEX_CACHE_SIZE', '128'))
+name_match_min_score = float(os.getenv('NAME_MATCH_MIN_SCORE', '0.6'))
+name_match_tie_margin = float(os.getenv('NAME_MATCH_TIE_MARGIN', '0.05'))
+jql_cache_ttl = int(os.getenv('JQL_CACHE_TTL', '86400'))
+jql_cache_size = int(os.getenv('JQL_CACHE_SIZE', '1024'))
+llm_structured_repairs = int(os.getenv('LLM_STRUCTURED_REPAIRS', '2'))
+llm_default_model = os.getenv('LLM_DEFAULT_MODEL', 'azure/gpt-4o')
+llm_fast_model = os.getenv('LLM_FAST_MODEL', 'azure/gpt-4o-mini')
+model_routing = os.getenv('MODEL_ROUTING', '')
+redis_host = os.getenv('REDIS_HOST', 'localhost')
+redis_port = int(os.getenv('REDIS_PORT', '6379'))
+redis_password = os.getenv('REDIS_PASSWORD')
+redis_db = int(os.getenv('REDIS_DB', '0'))
+redis_ssl = os.getenv('REDIS_SSL', 'false') == 'true'
+redis_max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+redis_socket_timeout = float(os.getenv('REDIS_SOCKET_TIMEOUT', '5'))
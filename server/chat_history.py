@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+import env as config
+from server.common.database.redis import client as redis
+from server.config.llm_caller import LLMCaller
+from server.config.model_routing import model_routing
+
+# Prefix of the Redis lists holding chat history, one list per session
+HISTORY_PREFIX = 'chat:history:'
+
+ROLES = {'user': 'u', 'assistant': 'a', 'system': 's'}
+ROLE_NAMES = {code: role for role, code in ROLES.items()}
+
+
+def history_key(session_id: str) -> str:
+    return f'{HISTORY_PREFIX}{session_id}'
+
+
+def encode_entry(entry: Dict[str, Any]) -> str:
+    """
+    Encode a history entry as a compact JSON array: [role code, content, id?].
+    """
+    fields = [ROLES.get(entry['role'], entry['role']), entry['content']]
+    if entry.get('id'):
+        fields.append(entry['id'])
+    return json.dumps(fields, separators=(',', ':'), ensure_ascii=False)
+
+
+def decode_entry(data: str) -> Dict[str, Any]:
+    role, content, *rest = json.loads(data)
+    entry = {'role': ROLE_NAMES.get(role, role), 'content': content}
+    if rest:
+        entry['id'] = rest[0]
+    return entry
+
+
+# Helper function to append entries to chat history in Redis
+async def append_session(session_id: str, entries: List[Dict[str, Any]]):
+    """
+    Append entries to a session history in one round trip.
+
+    The list is trimmed to the last CHAT_HISTORY_MAX_ENTRIES entries and its
+    time to live is refreshed in the same MULTI, so a session never grows past
+    the window and idle sessions expire.
+    """
+    key = history_key(session_id)
+    async with redis.get().pipeline(transaction=True) as pipe:
+        pipe.rpush(key, *[encode_entry(entry) for entry in entries])
+        pipe.ltrim(key, -config.chat_history_max_entries, -1)
+        pipe.expire(key, config.chat_history_ttl)
+        await pipe.execute()
+
+
+# Helper function to retrieve chat history
+async def get_session(
+    session_id: str, window: int = config.chat_history_window
+) -> List[Dict[str, Any]]:
+    """
+    Return the last `window` entries of a session history, oldest first.
+    """
+    data = await redis.get().lrange(history_key(session_id), -window, -1)
+    history = [decode_entry(item) for item in data]
+    # A window cut between a question and its answer would open on a reply
+    while history and history[0]['role'] == 'assistant':
+        history.pop(0)
+    return history
+
+
+async def replace_entry(session_id: str, entry_id: str, content: str) -> bool:
+    """
+    Replace the content of the entry tagged with the id and drop its tag.
+
+    The list is read and the entry set in one WATCH/MULTI transaction, which
+    redis-py retries when another turn appended or trimmed the session in
+    between, so the write always lands on the right index.
+
+    Returns:
+        bool: False when the entry is no longer in the session.
+    """
+    key = history_key(session_id)
+
+    async def replace(pipe) -> bool:
+        history = [decode_entry(item) for item in await pipe.lrange(key, 0, -1)]
+        index = next(
+            (i for i, entry in enumerate(history) if entry.get('id') == entry_id),
+            None,
+        )
+        if index is None:
+            return False
+        entry = {'role': history[index]['role'], 'content': content}
+        pipe.multi()
+        pipe.lset(key, index, encode_entry(entry))
+        return True
+
+    return await redis.get().transaction(replace, key, value_from_callable=True)
+
+
+def prompt_messages(history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Strip the bookkeeping keys of history entries before they are sent to a model.
+    """
+    return [
+        {'role': entry['role'], 'content': entry['content']}
+        for entry in history
+        if isinstance(entry, dict)
+    ]
+
+
+class HistoryCompactor:
+    """
+    Deferred summarization of assistant replies stored in chat history.
+
+    A turn appends the user message and the full reply at once, tagged with an
+    entry id, and enqueues the reply here. Workers summarize it off the request
+    path and swap the summary into the entry with replace_entry. Turns only
+    append to the session list, so concurrent turns never overwrite each
+    other. When the bounded queue is full the reply is kept unsummarized.
+
+    Attributes:
+        queue_size (int): Maximum number of replies waiting to be summarized.
+        workers (int): Number of concurrent summarizations.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = config.chat_compaction_queue_size,
+        workers: int = config.chat_compaction_workers,
+    ):
+        self.queue_size = queue_size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._run()) for _ in range(max(self.workers, 1))
+        ]
+        logging.info('Chat history compaction started')
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info('Chat history compaction stopped')
+
+    async def save_turn(self, session_id: str, message: str, assistant_response: str):
+        """
+        Append a user message and the assistant reply to the session history and
+        queue the reply for summarization.
+        """
+        entry_id = uuid.uuid4().hex
+        await append_session(
+            session_id,
+            [
+                {'role': 'user', 'content': str(message)},
+                {'role': 'assistant', 'content': assistant_response, 'id': entry_id},
+            ],
+        )
+
+        self.start()
+        try:
+            self._queue.put_nowait((session_id, entry_id, assistant_response))
+        except asyncio.QueueFull:
+            logging.warning(
+                'Compaction queue is full, keeping the full reply for %s', session_id
+            )
+
+    async def _run(self):
+        while True:
+            session_id, entry_id, assistant_response = await self._queue.get()
+            try:
+                await self._compact(session_id, entry_id, assistant_response)
+            except Exception as e:
+                logging.warning(
+                    'Could not compact the history of %s: %s', session_id, e
+                )
+
+    async def _compact(self, session_id: str, entry_id: str, assistant_response: str):
+        summarized_content = await summarize_reply(assistant_response)
+        await replace_entry(session_id, entry_id, summarized_content)
+
+
+async def summarize_reply(assistant_response: str) -> str:
+    """
+    Summarize an assistant reply for shorter context retention.
+
+    The summary goes through LLMCaller on the 'reply_summary' route, so it waits
+    for the same per-model rate limit and follows the same retry policy as
+    request-path completions.
+    """
+    payload = {
+        **model_routing.payload('reply_summary'),
+        'messages': [
+            {
+                'role': 'system',
+                'content': 'Summarize the response while keeping key details.',
+            },
+            {'role': 'user', 'content': assistant_response},
+        ],
+    }
+    response = await LLMCaller(payload).llm_unstructured_completion()
+    return response.response
+
+
+# Create an instance of the history compactor
+history_compactor = HistoryCompactor()
@@ -0,0 +1,112 @@
+import asyncio
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Set,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+async def aiter_items(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    """
+    Iterate a sync or async iterable asynchronously.
+    """
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def gather_bounded(
+    items: Union[Iterable[T], AsyncIterable[T]],
+    worker: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> List[Union[R, BaseException]]:
+    """
+    Run the worker over every item with at most `limit` calls in flight.
+
+    Args:
+        items (Iterable | AsyncIterable): Items to process. Items of an async
+            iterable are started as soon as they arrive.
+        worker (Callable): Coroutine function called once per item.
+        limit (int): Maximum number of concurrent worker calls.
+
+    Returns:
+        List: One entry per item in input order, holding either the worker result
+        or the exception it raised, so one failing item does not fail the rest.
+        An error raised by the iterable itself cancels the calls already started
+        and is raised.
+    """
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await worker(item)
+
+    started: List[asyncio.Future] = []
+
+    def start(item: T) -> asyncio.Future:
+        task = asyncio.ensure_future(run(item))
+        started.append(task)
+        return task
+
+    try:
+        tasks = [start(item) async for item in aiter_items(items)]
+    except BaseException:
+        # Calls already started must not outlive a failing iterable
+        for task in started:
+            task.cancel()
+        await asyncio.gather(*started, return_exceptions=True)
+        raise
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _outcome(task: asyncio.Future) -> Union[R, BaseException]:
+    return task.exception() or task.result()
+
+
+async def iter_bounded(
+    items: Union[Iterable[T], AsyncIterable[T]],
+    worker: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> AsyncIterator[Union[R, BaseException]]:
+    """
+    Run the worker over the items with at most `limit` calls in flight, yielding
+    each result, or the exception it raised, as soon as it completes.
+
+    No new item is read while `limit` calls are running. Calls still running
+    when the iteration stops early or fails are cancelled.
+    """
+    limit = max(limit, 1)
+    pending: Set[asyncio.Future] = set()
+    try:
+        async for item in aiter_items(items):
+            pending.add(asyncio.ensure_future(worker(item)))
+            done = {task for task in pending if task.done()}
+            if len(pending) >= limit and not done:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            pending -= done
+            for task in done:
+                yield _outcome(task)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield _outcome(task)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
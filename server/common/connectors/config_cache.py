@@ -0,0 +1,53 @@
+from typing import Any, Dict, Optional
+
+import env
+from server.common.cache import TTLCache
+from server.common.http.clients import registry as http_clients
+
+# Connector configurations keyed by (connector_type, connector_id)
+connector_configs: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=env.connector_config_cache_size, ttl=env.connector_config_ttl
+)
+
+
+async def get_connector_config(
+    connector_type: str, connector_id: str
+) -> Dict[str, Any]:
+    """
+    Fetch a connector configuration from the data service, served from cache when fresh.
+
+    Args:
+        connector_type (str): Connector type as used by the data service, e.g. 'jira',
+            'slack' or 'bland'.
+        connector_id (str): Id of the connector.
+
+    Returns:
+        Dict[str, Any]: The inner 'config' of the connector configuration.
+    """
+
+    async def load() -> Dict[str, Any]:
+        client = http_clients.get('data_service')
+        response = await client.get(
+            url=f'{env.klot_data_service_url}/actions/{connector_type}/config/{connector_id}',
+            headers={'x-server-key': env.web_server_secret},
+        )
+        response.raise_for_status()
+        configuration = response.json()
+        return configuration.get('config', {}).get('config', {})
+
+    return await connector_configs.get_or_load((connector_type, connector_id), load)
+
+
+def invalidate_connector_config(
+    connector_type: Optional[str] = None, connector_id: Optional[str] = None
+) -> int:
+    """
+    Drop cached connector configurations matching the given type and id.
+
+    Returns:
+        int: Number of entries removed. Without filters the whole cache is cleared.
+    """
+    return connector_configs.invalidate_where(
+        lambda key: (connector_type is None or key[0] == connector_type)
+        and (connector_id is None or key[1] == connector_id)
+    )
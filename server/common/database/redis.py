@@ -0,0 +1,66 @@
+import logging
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.connection import Connection, SSLConnection
+
+import env
+
+
+class RedisClient:
+    """
+    RedisClient class to manage a shared asyncio connection pool to Redis.
+
+    Attributes:
+        client (Redis): The Redis client backed by the shared pool.
+    """
+
+    def __init__(self):
+        self.client: Optional[Redis] = None
+
+    def connect(self):
+        """
+        Create the connection pool using environment variables.
+
+        If a client already exists, it does nothing.
+        """
+        if self.client is not None:
+            return
+        pool = ConnectionPool(
+            host=env.redis_host,
+            port=env.redis_port,
+            password=env.redis_password,
+            db=env.redis_db,
+            max_connections=env.redis_max_connections,
+            socket_timeout=env.redis_socket_timeout,
+            socket_connect_timeout=env.redis_socket_timeout,
+            connection_class=SSLConnection if env.redis_ssl else Connection,
+            decode_responses=True,
+        )
+        self.client = Redis(connection_pool=pool)
+        logging.info('Redis connection pool created')
+
+    async def disconnect(self):
+        """
+        Close the client and every pooled connection.
+
+        If no client exists, it logs a warning.
+        """
+        if self.client is None:
+            logging.warning('Connection is None, nothing to close')
+            return
+        await self.client.aclose(close_connection_pool=True)
+        self.client = None
+        logging.info('Redis connection pool closed')
+
+    def get(self) -> Redis:
+        """
+        Return the shared client, creating the pool on first use outside the app.
+        """
+        if self.client is None:
+            self.connect()
+        return self.client
+
+
+# Create an instance of the Redis client
+client = RedisClient()
@@ -0,0 +1,101 @@
+import importlib.util
+import logging
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+import env
+from server.config.upstreams import Upstreams, UpstreamSettings, upstreams
+
+# Upstreams that always live on the same host, so callers only pass the name
+FIXED_HOSTS = {
+    'data_service': env.klot_data_service_url,
+    'bland': 'https://api.bland.ai',
+    'slack': 'https://slack.com',
+}
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+def _origin(url: str) -> str:
+    parsed = httpx.URL(url)
+    return f'{parsed.scheme}://{parsed.netloc.decode()}'
+
+
+class HTTPClientRegistry:
+    """
+    Registry of pooled httpx clients shared by every router.
+
+    One client is kept per (upstream, host) pair so that TCP/TLS connections to
+    the data service, Bland, Slack and every Jira site are reused across requests
+    instead of being opened per call.
+
+    Attributes:
+        settings (Upstreams): Pool limits, keep-alive and timeouts per upstream.
+    """
+
+    def __init__(self, settings: Upstreams = upstreams):
+        self.settings = settings
+        self._clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        settings: UpstreamSettings = getattr(
+            self.settings, upstream, self.settings.default
+        )
+        http2 = settings.http2 and HTTP2_AVAILABLE
+        if settings.http2 and not HTTP2_AVAILABLE:
+            logging.warning('h2 is not installed, %s falls back to HTTP/1.1', upstream)
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.read_timeout, connect=settings.connect_timeout
+            ),
+        )
+
+    def get(self, upstream: str, url: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        Return the pooled client for an upstream, creating it on first use.
+
+        Args:
+            upstream (str): Upstream name, e.g. 'data_service', 'bland' or 'jira'.
+            url (Optional[str]): Any URL on the target host. Required for upstreams
+                without a fixed host such as Jira sites.
+
+        Returns:
+            httpx.AsyncClient: The shared client for that upstream and host.
+        """
+        origin = _origin(url or FIXED_HOSTS[upstream])
+        key = (upstream, origin)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._build(upstream)
+            self._clients[key] = client
+        return client
+
+    def connect(self):
+        """
+        Create the clients for the fixed-host upstreams ahead of the first request.
+        """
+        for upstream, url in FIXED_HOSTS.items():
+            if url:
+                self.get(upstream, url)
+        logging.info('HTTP client pools created')
+
+    async def disconnect(self):
+        """
+        Close every pooled client and release its connections.
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+        logging.info('HTTP client pools closed')
+
+
+# Create an instance of the HTTP client registry
+registry = HTTPClientRegistry()
@@ -0,0 +1,99 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Weighted cues per intent; a query's score for an intent is the sum of the
+# weights of the cues it contains
+INTENT_LEXICON: Dict[str, List[Tuple[re.Pattern, float]]] = {
+    'create': [
+        (re.compile(r'\b(create|raise|file|log|open up|make|add)\b'), 2.0),
+        (re.compile(r'\bnew (ticket|issue|bug|task|story|epic)\b'), 2.0),
+        (re.compile(r'\b(assign(ee)? (it|this) to|reporter)\b'), 0.5),
+    ],
+    'delete': [
+        (re.compile(r'\b(delete|remove|trash|get rid of|discard)\b'), 3.0),
+    ],
+    'find': [
+        (
+            re.compile(
+                r'\b(show|list|find|search|fetch|display|get|give me|look up)\b'
+            ),
+            2.0,
+        ),
+        (re.compile(r'\b(which|what|how many|any|all)\b'), 1.0),
+        (
+            re.compile(
+                r'\b(assigned to|reported by|due|overdue|open|in progress|done|blocked|updated|created (by|in|on|last|this|since))\b'
+            ),
+            1.0,
+        ),
+        (re.compile(r'\b(tickets|issues|bugs|tasks|stories)\b'), 0.5),
+    ],
+    'not_found': [
+        (
+            re.compile(r'\b(update|edit|change|modify|move|transition|comment on)\b'),
+            2.0,
+        ),
+    ],
+}
+
+# Intents the rules may decide; create and delete change data on the Jira site
+# and are always confirmed by the model
+RULE_INTENTS = {'find'}
+
+# Cues of a field change or an edit of an existing ticket; any of them defers
+# the query to the model
+UPDATE_CUES = re.compile(
+    r'\b(assignee|comments?|priority|due date|log(ged)? (work|time|\d)|worklogs?'
+    r'|labels?|attachments?|watchers?|(from|on|to|of) [a-z][a-z0-9]+-\d+)\b'
+)
+
+# Minimum winning score, and lead over the runner-up, for a rule decision
+MIN_SCORE = 2.0
+MIN_MARGIN = 1.0
+
+
+def score_intents(query: str) -> Dict[str, float]:
+    text = query.lower()
+    return {
+        intent: sum(weight for pattern, weight in cues if pattern.search(text))
+        for intent, cues in INTENT_LEXICON.items()
+    }
+
+
+def classify_intent(query: str) -> Optional[str]:
+    """
+    Recognize a clear Jira chat search locally.
+
+    Only 'find' is decided by the rules. Queries that lean towards create or
+    delete, mention a field change or point at an existing ticket are left to
+    the model, so a misread query never creates or deletes an issue.
+
+    Returns:
+        Optional[str]: 'find' when it clearly wins on the lexicon and no update
+        cue is present, None when the query should be left to the model.
+    """
+    scores = score_intents(query)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (top, top_score), (_, runner_up) = ranked[0], ranked[1]
+    vetoed = UPDATE_CUES.search(query.lower()) is not None
+    intent = (
+        top
+        if top in RULE_INTENTS
+        and not vetoed
+        and top_score >= MIN_SCORE
+        and top_score - runner_up >= MIN_MARGIN
+        else None
+    )
+    logging.info(
+        'Intent routing: %s by rules for %r, scores %s%s',
+        intent or 'deferred',
+        query,
+        scores,
+        ', update cue' if vetoed else '',
+    )
+    return intent
+
+
+def log_model_intent(query: str, intent: str):
+    logging.info('Intent routing: %s by model for %r', intent, query)
@@ -0,0 +1,201 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+import env
+from server.common.concurrency import gather_bounded
+from server.common.http.clients import registry as http_clients
+
+# Fields requested when searching tickets to review; the key is always returned
+TICKET_FIELDS = [
+    'summary',
+    'status',
+    'issuetype',
+    'priority',
+    'assignee',
+    'reporter',
+    'created',
+    'updated',
+    'duedate',
+]
+
+
+class JiraClient:
+    """
+    Async client for the Jira cloud REST API.
+
+    Requests go through the pooled 'jira' client of the HTTP client registry, so
+    connections to a Jira site are reused and the upstream timeouts apply.
+    Non-2xx responses raise httpx.HTTPStatusError.
+
+    Attributes:
+        account_url (str): Base URL of the Jira site.
+        auth (tuple): Email and API token used for basic auth.
+    """
+
+    def __init__(self, account_url: str, email: str, api_token: str):
+        self.account_url = account_url.rstrip('/')
+        self.auth = (email, api_token)
+        self.http = http_clients.get('jira', self.account_url)
+
+    @classmethod
+    def from_config(cls, config_data: Dict[str, Any]) -> 'JiraClient':
+        """
+        Build a client from a Jira connector configuration.
+        """
+        return cls(
+            account_url=config_data['account_url'],
+            email=config_data['email'],
+            api_token=config_data['api_token'],
+        )
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        response = await self.http.request(
+            method,
+            f'{self.account_url}{path}',
+            auth=self.auth,
+            headers={
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+            },
+            **kwargs,
+        )
+        response.raise_for_status()
+        return response
+
+    async def search(
+        self,
+        jql: str,
+        max_results: Optional[int] = None,
+        start_at: int = 0,
+        fields: Optional[List[str]] = None,
+        api_version: str = '3',
+    ) -> Dict[str, Any]:
+        """
+        Run a JQL search and return the raw search page.
+        """
+        params: Dict[str, Any] = {'jql': jql, 'startAt': start_at}
+        if max_results is not None:
+            params['maxResults'] = max_results
+        if fields:
+            params['fields'] = ','.join(fields)
+        response = await self._request(
+            'GET', f'/rest/api/{api_version}/search', params=params
+        )
+        return response.json()
+
+    async def iter_search(
+        self,
+        jql: str,
+        fields: Optional[List[str]] = None,
+        page_size: int = env.jira_search_page_size,
+        api_version: str = '3',
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the issues matching a JQL query, fetching one page at a time.
+
+        Args:
+            jql (str): JQL query.
+            fields (Optional[List[str]]): Fields to request, all navigable fields
+                when omitted.
+            page_size (int): Issues requested per page.
+            api_version (str): REST API version of the search endpoint.
+        """
+        start_at = 0
+        while True:
+            page = await self.search(
+                jql,
+                max_results=page_size,
+                start_at=start_at,
+                fields=fields,
+                api_version=api_version,
+            )
+            issues = page.get('issues', [])
+            for issue in issues:
+                yield issue
+            start_at += len(issues)
+            if not issues or start_at >= page.get('total', 0):
+                return
+
+    async def get_issue(self, key: str) -> Dict[str, Any]:
+        response = await self._request('GET', f'/rest/api/3/issue/{key}')
+        return response.json()
+
+    async def create_issue(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._request(
+            'POST', '/rest/api/3/issue', json={'fields': fields}
+        )
+        return response.json()
+
+    async def delete_issue(self, key: str) -> None:
+        await self._request('DELETE', f'/rest/api/3/issue/{key}')
+
+    async def search_users(
+        self, start_at: int = 0, max_results: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        List users of the Jira site.
+        """
+        params: Dict[str, Any] = {'startAt': start_at}
+        if max_results is not None:
+            params['maxResults'] = max_results
+        response = await self._request('GET', '/rest/api/3/users/search', params=params)
+        return response.json()
+
+    async def list_all_users(
+        self, page_size: int = env.jira_users_page_size
+    ) -> List[Dict[str, Any]]:
+        """
+        List every user of the Jira site, following users/search pagination.
+        """
+        users: List[Dict[str, Any]] = []
+        start_at = 0
+        while True:
+            page = await self.search_users(start_at=start_at, max_results=page_size)
+            users.extend(page)
+            if len(page) < page_size:
+                return users
+            start_at += len(page)
+
+    async def find_users(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Find users whose name or email matches the query.
+        """
+        response = await self._request(
+            'GET', '/rest/api/3/user/search', params={'query': query}
+        )
+        return response.json()
+
+    async def bulk_users(self, account_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch several users by account id in a single request.
+        """
+        response = await self._request(
+            'GET',
+            '/rest/api/3/user/bulk',
+            params={'accountId': account_ids, 'maxResults': len(account_ids)},
+        )
+        return response.json().get('values', [])
+
+    async def bulk_users_batched(
+        self,
+        account_ids: List[str],
+        batch_size: int = env.jira_user_bulk_batch_size,
+        concurrency: int = env.jira_request_concurrency,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch users by account id through the bulk endpoint, batches running concurrently.
+
+        Raises the first batch error so a partial roster is never returned silently.
+        """
+        batches = [
+            account_ids[index : index + batch_size]
+            for index in range(0, len(account_ids), batch_size)
+        ]
+        results = await gather_bounded(batches, self.bulk_users, concurrency)
+        users: List[Dict[str, Any]] = []
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            users.extend(result)
+        return users
@@ -0,0 +1,34 @@
+from typing import Any, Dict
+
+import env
+from server.common.cache import TTLCache
+from server.common.jira.client import JiraClient
+
+# Full Jira issues keyed by (site, issue key, fields.updated)
+jira_issues: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=env.jira_issue_cache_size, ttl=env.jira_issue_cache_ttl
+)
+
+
+async def get_issue_cached(jira: JiraClient, ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the full issue for a search result, served from cache while it is unchanged.
+
+    The cache key includes the 'updated' timestamp of the search result, so an
+    issue edited since it was cached misses and is fetched again. Tickets
+    without an 'updated' field are always fetched.
+
+    Args:
+        jira (JiraClient): Client of the Jira site the ticket belongs to.
+        ticket (Dict[str, Any]): Issue as returned by a search, with 'fields.updated'.
+
+    Returns:
+        Dict[str, Any]: The issue as returned by the issue endpoint.
+    """
+    updated = ticket.get('fields', {}).get('updated')
+    if not updated:
+        return await jira.get_issue(ticket['key'])
+    return await jira_issues.get_or_load(
+        (jira.account_url, ticket['key'], updated),
+        lambda: jira.get_issue(ticket['key']),
+    )
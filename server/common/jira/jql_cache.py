@@ -0,0 +1,23 @@
+import re
+from typing import Tuple
+
+import env
+from server.common.cache import TTLCache
+
+# JQL generated for chat queries, keyed by (connector id, normalized query).
+# Entries are stored only once Jira accepted the JQL.
+jql_queries: TTLCache[str] = TTLCache(maxsize=env.jql_cache_size, ttl=env.jql_cache_ttl)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a chat query so trivially different phrasings share a cache entry.
+
+    Case, punctuation other than characters meaningful in Jira keys and
+    repeated whitespace are ignored.
+    """
+    return ' '.join(re.sub(r'[^\w\s@.-]', ' ', query.lower()).split())
+
+
+def jql_cache_key(connector_id: str, query: str) -> Tuple[str, str]:
+    return connector_id, normalize_query(query)
@@ -0,0 +1,36 @@
+from typing import Any, Dict, List
+
+import env
+from server.common.cache import TTLCache
+from server.common.jira.client import JiraClient
+
+# Keys of a Jira user kept for prompts; avatars and self URLs are left out
+ROSTER_FIELDS = ['accountId', 'displayName', 'emailAddress']
+
+# Compacted Atlassian accounts of a Jira site keyed by site URL
+jira_rosters: TTLCache[List[Dict[str, Any]]] = TTLCache(
+    maxsize=env.jira_roster_cache_size, ttl=env.jira_roster_ttl
+)
+
+
+def compact_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: user[key] for key in ROSTER_FIELDS if user.get(key)}
+
+
+async def get_roster(jira: JiraClient) -> List[Dict[str, Any]]:
+    """
+    Return the Atlassian accounts of a Jira site reduced to ROSTER_FIELDS.
+
+    The paginated user listing is read once per site and served from cache for
+    JIRA_ROSTER_TTL seconds; app and customer accounts are left out.
+    """
+
+    async def load() -> List[Dict[str, Any]]:
+        users = await jira.list_all_users()
+        return [
+            compact_user(user)
+            for user in users
+            if user.get('accountType') == 'atlassian'
+        ]
+
+    return await jira_rosters.get_or_load(jira.account_url, load)
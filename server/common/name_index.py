@@ -0,0 +1,137 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+import env
+from server.common.cache import TTLCache
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase a name, strip accents and punctuation and collapse whitespace.
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    ascii_name = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', ascii_name.lower()).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f'  {text} '
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def edit_distance(first: str, second: str) -> int:
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (first_char != second_char),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def similarity(first: str, second: str) -> float:
+    """
+    Edit-distance similarity normalized to 0..1.
+    """
+    longest = max(len(first), len(second))
+    return 1 - edit_distance(first, second) / longest if longest else 1.0
+
+
+class NameIndex:
+    """
+    Fuzzy index of display names.
+
+    Candidates are retrieved through shared character trigrams and ranked by
+    normalized edit distance against the full name and against each of its
+    words, so a first name alone or a misspelt surname still matches.
+    """
+
+    shortlist_size = 50
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = []
+        self._normalized: List[str] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        for name in names:
+            if not name:
+                continue
+            position = len(self.names)
+            normalized = normalize_name(name)
+            self.names.append(name)
+            self._normalized.append(normalized)
+            for gram in trigrams(normalized):
+                self._postings[gram].add(position)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _score(self, query: str, position: int) -> float:
+        normalized = self._normalized[position]
+        words = normalized.split()
+        variants = (
+            [normalized]
+            + words
+            + [' '.join(words[index : index + 2]) for index in range(len(words) - 1)]
+        )
+        return max(similarity(query, variant) for variant in variants)
+
+    def search(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Return up to `limit` (display name, score) pairs, best first.
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+        shared: Counter = Counter()
+        for gram in trigrams(query):
+            shared.update(self._postings.get(gram, ()))
+        # Only the names sharing the most trigrams are scored by edit distance
+        shortlist = [
+            position for position, _ in shared.most_common(self.shortlist_size)
+        ]
+        ranked = sorted(
+            (
+                (self.names[position], self._score(query, position))
+                for position in shortlist
+            ),
+            key=lambda candidate: candidate[1],
+            reverse=True,
+        )
+        return ranked[:limit]
+
+
+def pick_name(
+    candidates: List[Tuple[str, float]],
+    min_score: float = env.name_match_min_score,
+    tie_margin: float = env.name_match_tie_margin,
+) -> Tuple[List[str], bool]:
+    """
+    Decide on ranked candidates.
+
+    Returns:
+        Tuple[List[str], bool]: The names still in contention above min_score,
+        and whether the first of them is a clear winner. Names within tie_margin
+        of the best are treated as tied.
+    """
+    passing = [(name, score) for name, score in candidates if score >= min_score]
+    if not passing:
+        return [], False
+    best = passing[0][1]
+    tied = [name for name, score in passing if best - score <= tie_margin]
+    return tied, len(tied) == 1
+
+
+# Name indexes keyed by (project id, table id)
+name_indexes: TTLCache[NameIndex] = TTLCache(
+    maxsize=env.name_index_cache_size, ttl=env.name_index_ttl
+)
@@ -0,0 +1,157 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from server.config.llm_limits import estimate_tokens
+from server.config.prompt_budgets import PromptBudget
+
+# Keys of a Bland call webhook worth showing a model, plus the task goal added on
+# receipt; 'transcripts' repeats the concatenated transcript turn by turn and is left out
+CALL_FIELDS = [
+    'call_id',
+    'to',
+    'from',
+    'created_at',
+    'call_length',
+    'status',
+    'disposition_tag',
+    'metadata',
+    'request_data',
+    'variables',
+    'summary',
+    'concatenated_transcript',
+    'task_goal',
+]
+
+# Variables of a Bland call kept for prompts; the rest are Bland's own defaults
+CALL_VARIABLE_FIELDS = ['user_id', 'phone_number', 'to', 'from']
+
+
+def adf_text(node: Any) -> str:
+    """
+    Flatten an Atlassian document format node to its plain text.
+    """
+    if isinstance(node, str):
+        return node
+    if isinstance(node, list):
+        return ' '.join(filter(None, (adf_text(child) for child in node)))
+    if isinstance(node, dict):
+        if node.get('type') == 'text':
+            return node.get('text', '')
+        return adf_text(node.get('content', []))
+    return ''
+
+
+def _name(value: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not isinstance(value, dict):
+        return None
+    return value.get('displayName') or value.get('name') or value.get('value')
+
+
+def compact_issue(issue: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a Jira issue to the fields a review prompt needs.
+
+    Avatars, self URLs and custom fields are dropped, people and statuses are
+    reduced to their names and rich text to plain text. An issue without
+    'fields' is returned unchanged.
+    """
+    fields = issue.get('fields')
+    if not isinstance(fields, dict):
+        return issue
+    comments = (fields.get('comment') or {}).get('comments', [])
+    worklogs = (fields.get('worklog') or {}).get('worklogs', [])
+    compacted = {
+        'key': issue.get('key'),
+        'summary': fields.get('summary'),
+        'description': adf_text(fields.get('description')),
+        'type': _name(fields.get('issuetype')),
+        'status': _name(fields.get('status')),
+        'priority': _name(fields.get('priority')),
+        'assignee': _name(fields.get('assignee')),
+        'reporter': _name(fields.get('reporter')),
+        'created': fields.get('created'),
+        'updated': fields.get('updated'),
+        'duedate': fields.get('duedate'),
+        'resolutiondate': fields.get('resolutiondate'),
+        'timespent': (fields.get('timetracking') or {}).get('timeSpent'),
+        'comments': [
+            {
+                'author': _name(comment.get('author')),
+                'created': comment.get('created'),
+                'body': adf_text(comment.get('body')),
+            }
+            for comment in comments
+        ],
+        'worklogs': [
+            {
+                'author': _name(worklog.get('author')),
+                'started': worklog.get('started'),
+                'timeSpent': worklog.get('timeSpent'),
+            }
+            for worklog in worklogs
+        ],
+    }
+    return {
+        key: value for key, value in compacted.items() if value not in (None, '', [])
+    }
+
+
+def compact_call(call: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a Bland call webhook payload to the fields a prompt needs.
+    """
+    compacted = {
+        key: call[key] for key in CALL_FIELDS if call.get(key) not in (None, '', [], {})
+    }
+    variables = compacted.get('variables')
+    if isinstance(variables, dict):
+        compacted['variables'] = {
+            key: value
+            for key, value in variables.items()
+            if key in CALL_VARIABLE_FIELDS
+        }
+    return compacted
+
+
+def _truncate(value: Any, max_chars: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + '…'
+    if isinstance(value, list):
+        return [_truncate(item, max_chars, max_items) for item in value[-max_items:]]
+    if isinstance(value, dict):
+        return {
+            key: _truncate(item, max_chars, max_items) for key, item in value.items()
+        }
+    return value
+
+
+def render(value: Any, budget: PromptBudget) -> str:
+    """
+    Render a compacted object as compact JSON that fits the budget.
+
+    Strings and lists are capped first; while the estimated tokens still exceed
+    the budget, the string and list caps are halved.
+    """
+    max_chars = budget.max_field_chars
+    max_items = budget.max_list_items
+    while True:
+        rendered = json.dumps(
+            _truncate(value, max_chars, max_items),
+            ensure_ascii=False,
+            separators=(',', ':'),
+            default=str,
+        )
+        tokens = estimate_tokens([{'content': rendered}], {})
+        if tokens <= budget.max_tokens or (max_chars <= 64 and max_items <= 1):
+            return rendered
+        max_chars = max(64, max_chars // 2)
+        max_items = max(1, max_items // 2)
+
+
+def render_issues(issues: List[Dict[str, Any]], budget: PromptBudget) -> str:
+    """
+    Render several issues, each compacted and capped to the budget on its own.
+    """
+    return (
+        '[' + ','.join(render(compact_issue(issue), budget) for issue in issues) + ']'
+    )
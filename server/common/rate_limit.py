@@ -0,0 +1,100 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute admission control.
+
+    Two token buckets refill continuously at rpm/60 and tpm/60 per second.
+    Callers that do not fit the current budget wait in FIFO order instead of
+    failing, so bursts are smoothed to the configured ceiling.
+
+    Attributes:
+        rpm (int): Requests admitted per minute.
+        tpm (int): Estimated tokens admitted per minute.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _delay(self, tokens: int) -> float:
+        missing_requests = max(0.0, 1 - self._requests)
+        missing_tokens = max(0.0, tokens - self._tokens)
+        return max(missing_requests * 60 / self.rpm, missing_tokens * 60 / self.tpm)
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until one request of `tokens` estimated tokens fits the budget.
+
+        A request larger than the whole token budget is admitted once the bucket
+        is full rather than waiting forever.
+
+        Returns:
+            float: Seconds the caller waited.
+        """
+        tokens = min(tokens, self.tpm)
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                self._refill()
+                delay = self._delay(tokens)
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    self._refill()
+                    delay = self._delay(tokens)
+                self._requests -= 1
+                self._tokens -= tokens
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def try_acquire(self, tokens: int) -> bool:
+        """
+        Admit one request only if it fits the budget now and nobody is queued.
+
+        Returns:
+            bool: Whether the request was admitted; nothing is consumed otherwise.
+        """
+        tokens = min(tokens, self.tpm)
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._delay(tokens) > 0:
+            return False
+        self._requests -= 1
+        self._tokens -= tokens
+        self.admitted += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rpm': self.rpm,
+            'tpm': self.tpm,
+            'queue_depth': self.waiting,
+            'admitted': self.admitted,
+            'average_wait': self.total_wait / self.admitted if self.admitted else 0.0,
+            'max_wait': self.max_wait,
+        }
@@ -0,0 +1,42 @@
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+# ASGI scope of the request being served, shared with every task it spawns
+_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar('request_scope', default=None)
+_project: ContextVar[Optional[str]] = ContextVar('request_project', default=None)
+
+
+async def request_context_middleware(request: Request, call_next):
+    """
+    Remember the request scope and project so work done on its behalf can be attributed.
+
+    The project is taken from a 'projectId' query parameter or 'x-project-id'
+    header when present; handlers reading it from the body call set_project.
+    """
+    _scope.set(request.scope)
+    _project.set(
+        request.query_params.get('projectId') or request.headers.get('x-project-id')
+    )
+    return await call_next(request)
+
+
+def set_project(project_id: Optional[str]):
+    _project.set(project_id)
+
+
+def current_endpoint() -> str:
+    """
+    Return the route template of the current request, or 'background' outside one.
+    """
+    scope = _scope.get()
+    if scope is None:
+        return 'background'
+    route = scope.get('route')
+    path = getattr(route, 'path', None) or scope.get('path', '')
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+def current_project() -> Optional[str]:
+    return _project.get()
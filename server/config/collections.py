@@ -5,5 +5,7 @@ class DatabaseCollections(BaseModel):
     users: str = Field(default='users', description='Collection name for users')
     summaries: str = Field(default='summaries', description='Collection name for summaries')
     project_data: str = Field(default='project_data', description='Collection name for project data')
+    llm_cache: str = Field(default='llm_cache', description='Collection name for cached LLM completions')
+    llm_usage: str = Field(default='llm_usage', description='Collection name for LLM usage records')
 
 collections = DatabaseCollections()
@@ -0,0 +1,99 @@
+import datetime
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import env
+from server.common.cache import TTLCache
+from server.common.database.mongodb import client as mongodb
+from server.config.collections import collections
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM completions keyed by a hash of (model, messages, params).
+
+    Hits are served from an in-process LRU first and from a Mongo collection
+    shared by every worker second. Mongo expires entries through a TTL index on
+    'expires_at'; errors of the persistent tier are logged and treated as misses
+    so a cache outage never fails a completion.
+
+    Attributes:
+        memory (TTLCache): In-process tier.
+        ttl (int): Default seconds a completion stays cached.
+    """
+
+    def __init__(self, maxsize: int = env.llm_cache_size, ttl: int = env.llm_cache_ttl):
+        self.ttl = ttl
+        self.memory: TTLCache[Dict[str, Any]] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def collection(self):
+        return mongodb.db[collections.llm_cache]
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+        serialized = json.dumps(
+            {'model': model, 'messages': messages, 'params': params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        try:
+            document = await self.collection.find_one(
+                {'_id': key, 'expires_at': {'$gt': datetime.datetime.utcnow()}}
+            )
+        except Exception as e:
+            logging.warning('LLM cache lookup failed: %s', e)
+            return None
+        if document is None:
+            return None
+        remaining = (
+            document['expires_at'] - datetime.datetime.utcnow()
+        ).total_seconds()
+        self.memory.set(key, document['value'], ttl=remaining)
+        return document['value']
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[int] = None):
+        ttl = ttl or self.ttl
+        self.memory.set(key, value, ttl=ttl)
+        try:
+            await self.collection.update_one(
+                {'_id': key},
+                {
+                    '$set': {
+                        'value': value,
+                        'expires_at': datetime.datetime.utcnow()
+                        + datetime.timedelta(seconds=ttl),
+                    }
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logging.warning('LLM cache write failed: %s', e)
+
+    async def invalidate(self, key: str):
+        self.memory.invalidate(key)
+        try:
+            await self.collection.delete_one({'_id': key})
+        except Exception as e:
+            logging.warning('LLM cache delete failed: %s', e)
+
+    async def create_indexes(self):
+        """
+        Create the TTL index that lets Mongo drop expired completions.
+        """
+        try:
+            await self.collection.create_index('expires_at', expireAfterSeconds=0)
+        except Exception as e:
+            logging.warning('Could not create the LLM cache index: %s', e)
+
+
+# Create an instance of the LLM response cache
+llm_cache = LLMResponseCache()
@@ -1,10 +1,19 @@
-from typing import Any, Dict
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 import litellm
 
 import env as config
-import httpx
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+
+from server.config.llm_cache import llm_cache
+from server.config.llm_limits import estimate_tokens, llm_limiters
+from server.config.llm_retry import RetryPolicy, is_retryable, retry_policy
+from server.config.llm_usage import LLMUsage, usage_writer
 
 
 class UnstructuredLiteLLMCompletionResponse(BaseModel):
@@ -13,6 +22,60 @@ class UnstructuredLiteLLMCompletionResponse(BaseModel):
     prompt_tokens: int
     total_tokens: int
     tries: int
+    cached: bool = False
+
+
+class StructuredLiteLLMCompletionResponse(BaseModel):
+    parsed: Any
+    completion_tokens: int
+    prompt_tokens: int
+    total_tokens: int
+    tries: int
+    cached: bool = False
+
+
+def response_format_for(
+    model_name: str, response_model: Type[BaseModel]
+) -> Dict[str, Any]:
+    """
+    Ask for the model's JSON schema where the model supports it, plain JSON otherwise.
+    """
+    try:
+        supports_schema = litellm.supports_response_schema(model=model_name)
+    except Exception:
+        supports_schema = False
+    if not supports_schema:
+        return {'type': 'json_object'}
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': response_model.__name__,
+            'schema': response_model.model_json_schema(),
+        },
+    }
+
+
+def parse_structured(content: str, response_model: Type[BaseModel]) -> BaseModel:
+    """
+    Validate a completion against the model, repairing common wrapping first.
+
+    Markdown code fences and prose around the outermost JSON object are
+    stripped before validation.
+
+    Raises:
+        ValueError: If no valid object can be recovered.
+    """
+    text = (content or '').strip()
+    fenced = re.search(r'```(?:json)?\s*(.*?)```', text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        text = text[start : end + 1]
+    try:
+        return response_model.model_validate_json(text)
+    except ValidationError as e:
+        raise ValueError(str(e)) from e
 
 
 class LLMCaller:
@@ -20,9 +83,17 @@ class LLMCaller:
         self,
         payload: Dict[str, Any],
         for_validation: bool = False,
+        cache: bool = False,
+        cache_ttl: Optional[int] = None,
+        policy: Optional[RetryPolicy] = None,
     ):
         self.payload = payload
         self.for_validation = for_validation
+        self.cache = cache and config.llm_cache_enabled
+        self.cache_ttl = cache_ttl
+        self.retry_policy = policy or retry_policy
+        self.tries = 0
+        self.cache_key: Optional[str] = None
         self._headers = {
             'stsk': config.web_server_secret,
             'x-server-key': config.web_server_secret,
@@ -34,6 +105,13 @@ class LLMCaller:
         Makes a POST request to the LLM service to generate a completion given a prompt.
 
         If not for validation, fetches the model list from the Key Vault and includes it in the payload.
+        Payload keys other than 'model' and 'messages' are passed to the completion as is.
+        When the caller opted into caching, an identical (model, messages, params)
+        request is answered from the LLM response cache without calling the model.
+        Calls wait for the per-model requests and tokens per minute budget first.
+        Failed or stuck completions are retried, hedged and moved to fallback models
+        according to the retry policy, and 'tries' counts every request sent.
+        Every call, cache hits and failures included, is recorded for usage accounting.
 
         Returns
         -------
@@ -41,25 +119,225 @@ class LLMCaller:
             The response from the LLM service.
         """
 
-        model_name = self.payload.get('model') or 'azure/gpt-4o'
+        model_name = self.payload.get('model') or config.llm_default_model
         messages = self.payload.get('messages')
+        params = {
+            key: value
+            for key, value in self.payload.items()
+            if key not in ('model', 'messages')
+        }
+
+        cache_key = self.cache_key = None
+        if self.cache:
+            started = time.monotonic()
+            cache_key = self.cache_key = llm_cache.key(model_name, messages, params)
+            hit = await llm_cache.get(cache_key)
+            if hit is not None:
+                usage_writer.record(
+                    LLMUsage(
+                        model=model_name,
+                        latency=time.monotonic() - started,
+                        cached=True,
+                    )
+                )
+                return UnstructuredLiteLLMCompletionResponse(**hit, cached=True)
 
-        # Retrieve previous chat history
+        started = time.monotonic()
+        self.tries = 0
         try:
-            # Call LiteLLM directly
-            response = await litellm.acompletion(
-                api_key=config.litellm_proxy_api_key,
-                base_url=str(config.litellm_proxy_api_base),
-                model=model_name or 'azure/gpt-4o',
-                messages=messages,
+            model_used, response = await self._complete(model_name, messages, params)
+        except Exception as e:
+            usage_writer.record(
+                LLMUsage(
+                    model=model_name,
+                    latency=time.monotonic() - started,
+                    tries=self.tries,
+                    error=repr(e),
+                )
             )
+            raise
+
+        completion = UnstructuredLiteLLMCompletionResponse(
+            response=response['choices'][0]['message']['content'],
+            completion_tokens=response['usage']['completion_tokens'],
+            prompt_tokens=response['usage']['prompt_tokens'],
+            total_tokens=response['usage']['total_tokens'],
+            tries=self.tries,
+        )
+        usage_writer.record(
+            LLMUsage(
+                model=model_used,
+                prompt_tokens=completion.prompt_tokens,
+                completion_tokens=completion.completion_tokens,
+                total_tokens=completion.total_tokens,
+                latency=time.monotonic() - started,
+                tries=completion.tries,
+            )
+        )
+        if cache_key is not None and completion.response:
+            await llm_cache.set(
+                cache_key,
+                completion.model_dump(exclude={'cached'}),
+                ttl=self.cache_ttl,
+            )
+        return completion
+
+    async def llm_structured_completion(
+        self,
+        response_model: Type[BaseModel],
+        max_repairs: int = config.llm_structured_repairs,
+    ) -> StructuredLiteLLMCompletionResponse:
+        """
+        Generate a completion validated against a Pydantic model.
+
+        The JSON schema of the model is sent as response_format where the model
+        supports it. A reply that does not validate is repaired locally when it
+        only carries extra wrapping, and otherwise re-asked with the validation
+        error up to `max_repairs` times.
+
+        Returns
+        -------
+        StructuredLiteLLMCompletionResponse
+            The validated object in 'parsed' and the usage of every attempt.
 
-            return UnstructuredLiteLLMCompletionResponse(
-                response=response['choices'][0]['message']['content'],
-                completion_tokens=response['usage']['completion_tokens'],
-                prompt_tokens=response['usage']['prompt_tokens'],
-                total_tokens=response['usage']['total_tokens'],
-                tries=1,
+        Raises
+        ------
+        ValueError
+            If no attempt produced a valid object.
+        """
+        model_name = self.payload.get('model') or config.llm_default_model
+        messages = list(self.payload.get('messages') or [])
+        usage = {'completion_tokens': 0, 'prompt_tokens': 0, 'total_tokens': 0}
+        tries = 0
+        for attempt in range(max_repairs + 1):
+            caller = LLMCaller(
+                {
+                    **self.payload,
+                    'messages': messages,
+                    'response_format': response_format_for(model_name, response_model),
+                },
+                for_validation=self.for_validation,
+                cache=self.cache and attempt == 0,
+                cache_ttl=self.cache_ttl,
+                policy=self.retry_policy,
             )
-        except httpx.HTTPError as e:
-            raise e
\ No newline at end of file
+            completion = await caller.llm_unstructured_completion()
+            for key in usage:
+                usage[key] += getattr(completion, key)
+            tries += completion.tries
+            try:
+                parsed = parse_structured(completion.response, response_model)
+            except ValueError as e:
+                error = e
+                if caller.cache_key is not None:
+                    await llm_cache.invalidate(caller.cache_key)
+                logging.warning(
+                    'Invalid %s from %s: %s', response_model.__name__, model_name, e
+                )
+                messages = [
+                    *messages,
+                    {'role': 'assistant', 'content': completion.response or ''},
+                    {
+                        'role': 'user',
+                        'content': f'That reply is not valid: {e}. Reply again with only a JSON object matching this schema: {json.dumps(response_model.model_json_schema())}',
+                    },
+                ]
+                continue
+            return StructuredLiteLLMCompletionResponse(
+                parsed=parsed, tries=tries, cached=completion.cached, **usage
+            )
+        raise ValueError(
+            f'No valid {response_model.__name__} after {tries} tries: {error}'
+        )
+
+    async def _complete(
+        self, model_name: str, messages: List[Dict[str, Any]], params: Dict[str, Any]
+    ) -> Tuple[str, Any]:
+        """
+        Run the completion under the retry policy, falling back model by model.
+
+        Retryable errors are retried with jittered backoff; once a model is out
+        of retries the next fallback model is tried. Other errors are raised.
+        """
+        models = [model_name] + [
+            model for model in self.retry_policy.fallback_models if model != model_name
+        ]
+        error: Optional[BaseException] = None
+        for model in models:
+            for retry in range(self.retry_policy.max_retries + 1):
+                if retry:
+                    await asyncio.sleep(self.retry_policy.backoff(retry - 1))
+                try:
+                    return model, await self._hedged_request(model, messages, params)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    error = e
+                    logging.warning(
+                        'Completion with %s failed on try %d: %r', model, self.tries, e
+                    )
+        raise error
+
+    async def _hedged_request(
+        self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]
+    ) -> Any:
+        """
+        Send the request, and a second identical one if the first is still running
+        after the hedge delay; the first successful answer wins.
+
+        The hedge delay starts once the first request is admitted by the rate
+        limiter, and the second request is only sent when the limiter has room
+        for it right away, so hedging never adds to a queue that is already
+        waiting.
+        """
+        self.tries += 1
+        await self._admit(model, messages, params)
+        hedge_after = self.retry_policy.hedge_after
+        if not hedge_after:
+            return await self._send(model, messages, params)
+
+        pending = {asyncio.ensure_future(self._send(model, messages, params))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done and llm_limiters.get(model).try_acquire(
+                estimate_tokens(messages, params)
+            ):
+                self.tries += 1
+                pending.add(asyncio.ensure_future(self._send(model, messages, params)))
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _admit(
+        self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]
+    ):
+        waited = await llm_limiters.get(model).acquire(
+            estimate_tokens(messages, params)
+        )
+        if waited > 1:
+            logging.info('Waited %.1fs for the %s rate limit', waited, model)
+
+    async def _send(
+        self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]
+    ) -> Any:
+        # Call LiteLLM directly
+        return await asyncio.wait_for(
+            litellm.acompletion(
+                api_key=config.litellm_proxy_api_key,
+                base_url=str(config.litellm_proxy_api_base),
+                model=model,
+                messages=messages,
+                **params,
+            ),
+            self.retry_policy.timeout,
+        )
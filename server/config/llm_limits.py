@@ -0,0 +1,67 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+import env
+from server.common.rate_limit import RateLimiter
+
+
+class ModelRateLimit(BaseModel):
+    rpm: int = Field(
+        default=env.llm_requests_per_minute, description='Requests per minute'
+    )
+    tpm: int = Field(
+        default=env.llm_tokens_per_minute, description='Estimated tokens per minute'
+    )
+
+
+class LLMRateLimits(BaseModel):
+    default: ModelRateLimit = Field(
+        default_factory=ModelRateLimit, description='Budget of any other model'
+    )
+    models: Dict[str, ModelRateLimit] = Field(
+        default_factory=dict, description='Budgets keyed by model name'
+    )
+
+
+# LLM_RATE_LIMITS holds per-model overrides, e.g. {"models": {"azure/gpt-4o": {"rpm": 60}}}
+llm_rate_limits = (
+    LLMRateLimits.model_validate_json(env.llm_rate_limits)
+    if env.llm_rate_limits
+    else LLMRateLimits()
+)
+
+
+class LLMLimiters:
+    """
+    Process-wide rate limiters, one per model, shared by every LLMCaller.
+    """
+
+    def __init__(self, settings: LLMRateLimits = llm_rate_limits):
+        self.settings = settings
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    def get(self, model: str) -> RateLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limit = self.settings.models.get(model, self.settings.default)
+            limiter = RateLimiter(rpm=limit.rpm, tpm=limit.tpm)
+            self._limiters[model] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> int:
+    """
+    Roughly estimate the tokens of a completion at four characters per token.
+
+    The requested max_tokens, when set, is added for the completion itself.
+    """
+    characters = sum(len(str(message.get('content') or '')) for message in messages)
+    return characters // 4 + 1 + int(params.get('max_tokens') or 0)
+
+
+# Create an instance of the per-model limiters
+llm_limiters = LLMLimiters()
@@ -0,0 +1,75 @@
+import asyncio
+import random
+from typing import List, Optional
+
+import httpx
+import litellm
+from pydantic import BaseModel, Field
+
+import env
+
+
+class RetryPolicy(BaseModel):
+    max_retries: int = Field(
+        default=env.llm_max_retries,
+        description='Retries per model after the first attempt',
+    )
+    base_delay: float = Field(
+        default=env.llm_retry_base_delay,
+        description='Backoff in seconds before the first retry, doubled per retry',
+    )
+    max_delay: float = Field(
+        default=env.llm_retry_max_delay, description='Upper bound of one backoff'
+    )
+    timeout: float = Field(
+        default=env.llm_request_timeout,
+        description='Seconds one completion may take before it is abandoned',
+    )
+    hedge_after: Optional[float] = Field(
+        default=env.llm_hedge_after or None,
+        description='Seconds after which a second, hedged request is sent',
+    )
+    fallback_models: List[str] = Field(
+        default_factory=lambda: [
+            model.strip()
+            for model in env.llm_fallback_models.split(',')
+            if model.strip()
+        ],
+        description='Models tried in order once the requested model gives up',
+    )
+
+    def backoff(self, retry: int) -> float:
+        """
+        Full-jitter exponential backoff before the given retry, counted from 0.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+# Errors worth another attempt; anything else, such as a bad request, is raised at once
+RETRYABLE_ERRORS = (
+    litellm.RateLimitError,
+    litellm.APIConnectionError,
+    litellm.InternalServerError,
+    litellm.ServiceUnavailableError,
+    litellm.Timeout,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+)
+
+RATE_LIMITED = 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == RATE_LIMITED or status >= 500
+    status_code = getattr(error, 'status_code', None)
+    return isinstance(error, litellm.APIError) and (
+        status_code is None or status_code >= 500
+    )
+
+
+# Create the default retry policy
+retry_policy = RetryPolicy()
@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import math
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+import env
+from server.common.database.mongodb import client as mongodb
+from server.common.request_context import current_endpoint, current_project
+from server.config.collections import collections
+
+
+class LLMUsage(BaseModel):
+    """
+    Usage of one completion, as recorded by LLMUsageWriter.
+    """
+
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency: float = Field(default=0.0, description='Seconds the completion took')
+    cached: bool = False
+    tries: int = 1
+    error: Optional[str] = None
+
+
+class LLMUsageWriter:
+    """
+    Buffered writer of LLM usage records.
+
+    Records are queued in memory and inserted into Mongo in batches by a
+    background task, so accounting never adds a database round trip to a
+    completion. When the queue is full new records are dropped with a warning.
+
+    Attributes:
+        batch_size (int): Records inserted per write.
+        flush_interval (float): Seconds between writes of a partial batch.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = env.llm_usage_queue_size,
+        batch_size: int = env.llm_usage_batch_size,
+        flush_interval: float = env.llm_usage_flush_interval,
+    ):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return mongodb.db[collections.llm_usage]
+
+    async def start(self):
+        """
+        Start the background writer and create the index used by the reports.
+        """
+        self._ensure_started()
+        try:
+            await self.collection.create_index('created_at')
+        except Exception as e:
+            logging.warning('Could not create the LLM usage index: %s', e)
+
+    async def stop(self):
+        """
+        Stop the background writer after flushing the queued records.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self._flush(self._drain())
+
+    def record(self, usage: LLMUsage):
+        """
+        Queue the usage of one completion, attributed to the current request.
+        """
+        if not env.llm_usage_enabled:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(
+                {
+                    **usage.model_dump(exclude={'latency'}),
+                    'endpoint': current_endpoint(),
+                    'project': current_project(),
+                    'latency_ms': round(usage.latency * 1000, 1),
+                    'created_at': datetime.datetime.utcnow(),
+                }
+            )
+        except asyncio.QueueFull:
+            logging.warning('LLM usage queue is full, dropping a record')
+
+    def _ensure_started(self):
+        # Workers outside the API process start writing on their first record
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        records = []
+        while self._queue is not None and not self._queue.empty():
+            records.append(self._queue.get_nowait())
+        return records
+
+    async def _flush(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        try:
+            await self.collection.insert_many(records, ordered=False)
+        except Exception as e:
+            logging.warning('Could not write %d LLM usage records: %s', len(records), e)
+
+    async def _run(self):
+        while True:
+            records = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(records) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    records.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(records)
+
+
+# Latencies are counted in logarithmic buckets, this many per doubling, so the
+# report keeps a bounded histogram per group instead of every latency
+LATENCY_BUCKETS_PER_DOUBLING = 4
+
+
+def bucket_upper_bound(bucket: int) -> float:
+    return round(2 ** ((bucket + 1) / LATENCY_BUCKETS_PER_DOUBLING), 1)
+
+
+def histogram_percentile(histogram: List[Dict[str, int]], fraction: float) -> float:
+    """
+    Nearest-rank percentile of a latency histogram, as its bucket's upper bound.
+
+    Returns 0 for an empty histogram. The value overstates the true latency by
+    at most one bucket width, about 19%.
+    """
+    total = sum(entry['calls'] for entry in histogram)
+    if not total:
+        return 0.0
+    rank = max(1, math.ceil(fraction * total))
+    seen = 0
+    for entry in sorted(histogram, key=lambda entry: entry['bucket']):
+        seen += entry['calls']
+        if seen >= rank:
+            return bucket_upper_bound(entry['bucket'])
+    return bucket_upper_bound(histogram[-1]['bucket'])
+
+
+async def usage_report(since: datetime.datetime) -> List[Dict[str, Any]]:
+    """
+    Aggregate the usage recorded since a time per endpoint and project.
+
+    Returns:
+        List[Dict[str, Any]]: One row per endpoint and project with call counts,
+        token totals and p50/p95 latency, most total tokens first.
+    """
+    cursor = usage_writer.collection.aggregate(
+        [
+            {'$match': {'created_at': {'$gte': since}}},
+            {
+                '$group': {
+                    '_id': {
+                        'endpoint': '$endpoint',
+                        'project': '$project',
+                        'bucket': {
+                            '$floor': {
+                                '$multiply': [
+                                    {'$log': [{'$max': ['$latency_ms', 1]}, 2]},
+                                    LATENCY_BUCKETS_PER_DOUBLING,
+                                ]
+                            }
+                        },
+                    },
+                    'calls': {'$sum': 1},
+                    'cached_calls': {'$sum': {'$cond': ['$cached', 1, 0]}},
+                    'errors': {
+                        '$sum': {'$cond': [{'$ifNull': ['$error', False]}, 1, 0]}
+                    },
+                    'prompt_tokens': {'$sum': '$prompt_tokens'},
+                    'completion_tokens': {'$sum': '$completion_tokens'},
+                    'total_tokens': {'$sum': '$total_tokens'},
+                }
+            },
+            {
+                '$group': {
+                    '_id': {'endpoint': '$_id.endpoint', 'project': '$_id.project'},
+                    'calls': {'$sum': '$calls'},
+                    'cached_calls': {'$sum': '$cached_calls'},
+                    'errors': {'$sum': '$errors'},
+                    'prompt_tokens': {'$sum': '$prompt_tokens'},
+                    'completion_tokens': {'$sum': '$completion_tokens'},
+                    'total_tokens': {'$sum': '$total_tokens'},
+                    'latencies': {
+                        '$push': {'bucket': '$_id.bucket', 'calls': '$calls'}
+                    },
+                }
+            },
+            {'$sort': {'total_tokens': -1}},
+        ]
+    )
+    report = []
+    async for row in cursor:
+        latencies = row.pop('latencies')
+        group = row.pop('_id')
+        report.append(
+            {
+                **group,
+                **row,
+                'p50_latency_ms': histogram_percentile(latencies, 0.5),
+                'p95_latency_ms': histogram_percentile(latencies, 0.95),
+            }
+        )
+    return report
+
+
+# Create an instance of the LLM usage writer
+usage_writer = LLMUsageWriter()
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+import env
+
+
+class TaskRoute(BaseModel):
+    model: str = Field(default=env.llm_default_model, description='Model name')
+    max_tokens: Optional[int] = Field(
+        default=None, description='Completion token cap, model default when unset'
+    )
+    temperature: Optional[float] = Field(
+        default=None, description='Sampling temperature, model default when unset'
+    )
+
+    def payload(self) -> Dict[str, Any]:
+        """
+        Completion payload keys of the route, to be merged with the messages.
+        """
+        return self.model_dump(exclude_none=True)
+
+
+def fast(max_tokens: int) -> TaskRoute:
+    return TaskRoute(model=env.llm_fast_model, max_tokens=max_tokens, temperature=0)
+
+
+class ModelRouting(BaseModel):
+    # Classification and short extraction tasks, served by the fast model
+    intent_detection: TaskRoute = Field(
+        default_factory=lambda: fast(10), description='Jira chat intent'
+    )
+    task_status: TaskRoute = Field(
+        default_factory=lambda: fast(10), description='Task done or in progress'
+    )
+    user_id_extraction: TaskRoute = Field(
+        default_factory=lambda: fast(50), description='user_id of a call webhook'
+    )
+    name_extraction: TaskRoute = Field(
+        default_factory=lambda: fast(30), description='Caller name in a conversation'
+    )
+    name_matching: TaskRoute = Field(
+        default_factory=lambda: fast(30), description='Pick among tied team members'
+    )
+    project_id_extraction: TaskRoute = Field(
+        default_factory=lambda: fast(50), description='projectId of a blocker call'
+    )
+    blocker_user_matching: TaskRoute = Field(
+        default_factory=lambda: fast(30), description='Jira user named as a blocker'
+    )
+    reply_summary: TaskRoute = Field(
+        default_factory=lambda: TaskRoute(model=env.llm_fast_model),
+        description='Chat reply kept in session history',
+    )
+    # Generation and reasoning tasks, served by the default model
+    ticket_review: TaskRoute = Field(
+        default_factory=TaskRoute, description='Concerns on tickets'
+    )
+    ticket_restatement: TaskRoute = Field(
+        default_factory=TaskRoute, description='Restating ticket concerns for a call'
+    )
+    blocker_detection: TaskRoute = Field(
+        default_factory=TaskRoute, description='Blocker details of a call'
+    )
+    email_draft: TaskRoute = Field(
+        default_factory=TaskRoute, description='Update and blocker emails'
+    )
+    ticket_draft: TaskRoute = Field(
+        default_factory=TaskRoute, description='Jira ticket to create or delete'
+    )
+    jql_generation: TaskRoute = Field(
+        default_factory=TaskRoute, description='JQL for a chat query'
+    )
+    default: TaskRoute = Field(default_factory=TaskRoute, description='Any other task')
+
+    def route(self, task: str) -> TaskRoute:
+        return getattr(self, task, self.default)
+
+    def payload(self, task: str) -> Dict[str, Any]:
+        return self.route(task).payload()
+
+
+# MODEL_ROUTING holds per-environment overrides, e.g. {"task_status": {"model": "azure/gpt-4o"}}
+model_routing = (
+    ModelRouting.model_validate_json(env.model_routing)
+    if env.model_routing
+    else ModelRouting()
+)
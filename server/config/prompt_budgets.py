@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+
+import env
+
+
+class PromptBudget(BaseModel):
+    max_tokens: int = Field(
+        default=3000, description='Estimated tokens the rendered object may take'
+    )
+    max_field_chars: int = Field(
+        default=2000, description='Characters kept of any single string value'
+    )
+    max_list_items: int = Field(
+        default=10, description='Items kept of any list, most recent last'
+    )
+
+
+class PromptBudgets(BaseModel):
+    ticket_review: PromptBudget = Field(
+        default_factory=PromptBudget, description='One ticket in the review prompt'
+    )
+    ticket_batch: PromptBudget = Field(
+        default_factory=lambda: PromptBudget(max_tokens=1500, max_field_chars=1000),
+        description='One ticket of a batched review prompt',
+    )
+    call_webhook: PromptBudget = Field(
+        default_factory=lambda: PromptBudget(
+            max_tokens=4000, max_field_chars=8000, max_list_items=20
+        ),
+        description='Bland call webhook payload',
+    )
+    default: PromptBudget = Field(
+        default_factory=PromptBudget, description='Any other prompt'
+    )
+
+
+# PROMPT_BUDGETS holds per-environment overrides, e.g. {"ticket_review": {"max_tokens": 2000}}
+prompt_budgets = (
+    PromptBudgets.model_validate_json(env.prompt_budgets)
+    if env.prompt_budgets
+    else PromptBudgets()
+)
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+
+import env
+
+
+class UpstreamSettings(BaseModel):
+    max_connections: int = Field(
+        default=env.http_max_connections,
+        description='Maximum number of open connections to the upstream host',
+    )
+    max_keepalive_connections: int = Field(
+        default=env.http_max_keepalive_connections,
+        description='Maximum number of idle connections kept alive in the pool',
+    )
+    keepalive_expiry: float = Field(
+        default=env.http_keepalive_expiry,
+        description='Seconds an idle connection is kept before it is closed',
+    )
+    connect_timeout: float = Field(
+        default=env.http_connect_timeout, description='Connect timeout in seconds'
+    )
+    read_timeout: float = Field(
+        default=env.http_read_timeout, description='Read timeout in seconds'
+    )
+    http2: bool = Field(default=env.http2_enabled, description='Negotiate HTTP/2')
+
+
+class Upstreams(BaseModel):
+    data_service: UpstreamSettings = Field(
+        default_factory=UpstreamSettings, description='klot data service'
+    )
+    bland: UpstreamSettings = Field(
+        default_factory=UpstreamSettings, description='Bland calls API'
+    )
+    jira: UpstreamSettings = Field(
+        default_factory=UpstreamSettings, description='Jira cloud sites'
+    )
+    slack: UpstreamSettings = Field(
+        default_factory=lambda: UpstreamSettings(read_timeout=10),
+        description='Slack web API',
+    )
+    default: UpstreamSettings = Field(
+        default_factory=UpstreamSettings, description='Any other upstream'
+    )
+
+
+# HTTP_UPSTREAMS holds per-environment overrides, e.g. {"jira": {"read_timeout": 60}}
+upstreams = (
+    Upstreams.model_validate_json(env.http_upstreams)
+    if env.http_upstreams
+    else Upstreams()
+)
@@ -1,17 +1,29 @@
 import asyncio
 import datetime
 import json
-from typing import List, Optional
+import logging
+from typing import Any, Dict, List, Optional
 
-import httpx
-import requests
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 import env
+from server.common.authorization.helpers import system_call
+from server.common.authorization.model import AuthenticatedUser
+from server.common.concurrency import gather_bounded
+from server.common.connectors.config_cache import (
+    get_connector_config,
+    invalidate_connector_config,
+)
 from server.common.database.mongodb import client as mongodb
+from server.common.http.clients import registry as http_clients
+from server.common.jira.client import TICKET_FIELDS, JiraClient
+from server.common.jira.roster import get_roster
+from server.common.request_context import set_project
 from server.config.collections import collections
 from server.config.llm_caller import LLMCaller
+from server.config.model_routing import model_routing
+from server.ticket_summaries import collect_ticket_summaries
 
 router = APIRouter()
 
@@ -50,62 +62,60 @@ class ProjectDetails(BaseModel):
 
 
 
-async def get_tickets_last_n_hours(config_data: dict, user_id: str, n : str):
+async def get_tickets_for_assignees(config_data: dict, account_ids: List[str], n: int) -> Dict[str, list]:
     """
-    Fetch tickets updated in the last 'n' hours.
+    Fetch tickets updated in the last 'n' hours for several assignees at once.
+
+    Assignees are swept in chunks of `assignee in (...)` queries running
+    concurrently, and the issues are grouped by assignee account id locally.
     """
     n = int(n)
-    # Headers for Authentication
-
-    # async with httpx.AsyncClient() as client:
-    #     response = await client.get(f"{env.klot_data_service_url}/actions/jira/config/{connector_id}", headers={"x-server-key": env.web_server_secret})
-    #     response.raise_for_status()
-    #     configuration = response.json()
-    #     config_data = configuration.get("config", {})
-    # Calculate the time N hours ago in Jira datetime format (YYYY-MM-DD HH:MM)
-    headers = {
-        "Accept": "application/json",
-    }
     time_n_hours_ago = (datetime.datetime.utcnow() - datetime.timedelta(hours=n)).strftime("%Y-%m-%d %H:%M")
-
-    # Jira Query Language (JQL) to filter issues updated in the last 'n' hours
-    jql_query = f'assignee = "{user_id}" AND updated >= "{time_n_hours_ago}" ORDER BY updated DESC'
-
-    account_url = config_data["account_url"]
-
-    search_url = f"{account_url}/rest/api/2/search?jql={jql_query}"
-    email = config_data["email"]
-    token = config_data["api_token"]
-    response = requests.get(search_url, headers=headers, auth=(email, token ))
-
-    if response.status_code == 200:
-        return response.json().get("issues", [])
-
-    return []
+    jira = JiraClient.from_config(config_data)
+
+    async def sweep(chunk: List[str]) -> list:
+        assignees = ", ".join(f'"{account_id}"' for account_id in chunk)
+        jql_query = f'assignee in ({assignees}) AND updated >= "{time_n_hours_ago}" ORDER BY updated DESC'
+        return [issue async for issue in jira.iter_search(jql_query, fields=TICKET_FIELDS, api_version="2")]
+
+    chunk_size = env.jira_assignee_chunk_size
+    chunks = [account_ids[index:index + chunk_size] for index in range(0, len(account_ids), chunk_size)]
+    results = await gather_bounded(chunks, sweep, env.jira_request_concurrency)
+
+    tickets_by_assignee: Dict[str, list] = {account_id: [] for account_id in account_ids}
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            logging.warning("Jira sweep failed for %s: %r", chunk, result)
+            continue
+        for issue in result:
+            assignee = (issue.get("fields", {}).get("assignee") or {}).get("accountId")
+            if assignee in tickets_by_assignee:
+                tickets_by_assignee[assignee].append(issue)
+    return tickets_by_assignee
 
 async def send_email_to_master(email_id: str, content: str, master_connector_id: str):
     try:
-        async with httpx.AsyncClient() as client:
-            json = {
-                "goal": f"send an email to {email_id} with content {content}, acting as the AI product Manager who is asking for the quick updates on the tickets and if the ticket require any update from the user, if the ticket has any blocker or not",
-            }
-            response = await client.post(f"{env.klot_data_service_url}/actions/master/action_selector/{master_connector_id}", json=json,headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            response_data = response.json()
-            return response_data
+        client = http_clients.get("data_service")
+        json = {
+            "goal": f"send an email to {email_id} with content {content}, acting as the AI product Manager who is asking for the quick updates on the tickets and if the ticket require any update from the user, if the ticket has any blocker or not",
+        }
+        response = await client.post(f"{env.klot_data_service_url}/actions/master/action_selector/{master_connector_id}", json=json,headers={"x-server-key": env.web_server_secret})
+        response.raise_for_status()
+        response_data = response.json()
+        return response_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def make_call_with_bland(phone_number: str, content: str, bland_connector_id):
     try:
-        async with httpx.AsyncClient() as client:
-            data = {
-                "phone_number": phone_number,
-                "task": content
-            }
-            response = await client.post(f"{env.klot_data_service_url}/actions/bland/send_call/{bland_connector_id}", json=data, headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            return response.json()
+        client = http_clients.get("data_service")
+        data = {
+            "phone_number": phone_number,
+            "task": content
+        }
+        response = await client.post(f"{env.klot_data_service_url}/actions/bland/send_call/{bland_connector_id}", json=data, headers={"x-server-key": env.web_server_secret})
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -117,7 +127,7 @@ async def validate_tickets(summaries: dict, input_details: ProjectDetails):
     for accountId, tickets_summary in summaries.items():
         stringify_tickets = f""" from the content available {tickets_summary}, summarize content including key value pairs of the tickets and return the stringified format of the tickets, make sure to maintain every detail from the ticket summary and return the stringified format of the tickets"""
         payload = {
-            "model": "azure/gpt-4o",
+            **model_routing.payload("ticket_restatement"),
             "messages": [
                 {
                     "role": "user",
@@ -174,16 +184,16 @@ async def validate_tickets(summaries: dict, input_details: ProjectDetails):
 
 async def make_call(phone_number: str, content: str, voice_connector_id: str):
     try:
-        async with httpx.AsyncClient() as client:
-            data = {
-                "phone_number": phone_number,
-                "initial_prompt": content,
-                "message" : "Hello! This is Mario - your AI project Manager calling to understand the status of the tickets you are working on",
-            }
-            print("data", data)
-            response = await client.post(f"{env.klot_data_service_url}/actions/voice/make_call/{voice_connector_id}",json=data,headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            return response.json()
+        client = http_clients.get("data_service")
+        data = {
+            "phone_number": phone_number,
+            "initial_prompt": content,
+            "message" : "Hello! This is Mario - your AI project Manager calling to understand the status of the tickets you are working on",
+        }
+        print("data", data)
+        response = await client.post(f"{env.klot_data_service_url}/actions/voice/make_call/{voice_connector_id}",json=data,headers={"x-server-key": env.web_server_secret})
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -192,51 +202,60 @@ async def manage_tickets(tickets: list, account_url: str, email: str, api_token:
     Manage the tickets and return the concerns.
     """
     try:
-        tickets_summary = {}
-        if tickets:
-            for ticket in tickets:
-
-                print("ticket", ticket["key"])
-                key = ticket["key"]
-                url = f"{account_url}/rest/api/3/issue/{key}"
-
-                # Prepare headers
-                headers = {
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                }
-
-                # Make GET request to retrieve ticket details
-                response = requests.get(
-                    url, headers=headers, auth=(email, api_token)
-                )
-                content = f"""
-                    you are a ai project manager, you have a ticket with the following details: {ticket},
-                    your task is to find if the ticket is up to date , being updated by developer timely and if the ticket is being resolved in time also check the ticket status according to the comments made by the developer with considering the due date and the time of the ticket creation with time logs, if things are fine with ticket return None else return the concerns to be resolved as a string value"""
-                payload = {
-                    "model": "azure/gpt-4o",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": content,
-                        },
-                    ],
-                }
-                llm_caller = LLMCaller(payload)
-                response = await llm_caller.llm_unstructured_completion()
-                summary_of_ticket = response.response
-                if summary_of_ticket:
-                    tickets_summary[ticket["key"]] = summary_of_ticket
-        return tickets_summary
+        jira = JiraClient(account_url, email, api_token)
+        return await collect_ticket_summaries(tickets, jira=jira)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
 
+# Shared by every request so concurrent runs together stay within the limit
+member_pipeline_slots = asyncio.Semaphore(env.member_pipeline_concurrency)
+
+
+class MemberPipelineRun(BaseModel):
+    """
+    Inputs shared by every member pipeline of one /project/manager/perform run.
+    """
+    jira_config_data: dict
+    input_details: ProjectDetails
+    summary_id: Any
+    timestamp: str
+
+
+async def run_member_pipeline(user: dict, tickets: list, run: MemberPipelineRun):
+    """
+    Summarize, persist and validate the tickets of one member.
+
+    Runs inside the global member pipeline limit and is cancelled once it exceeds
+    the member pipeline timeout.
+    """
+    async with member_pipeline_slots:
+        return await asyncio.wait_for(
+            process_member_tickets(user, tickets, run),
+            timeout=env.member_pipeline_timeout,
+        )
+
+
+async def process_member_tickets(user: dict, tickets: list, run: MemberPipelineRun):
+    print("tickets", tickets)
+    if len(tickets) == 0:
+        return None
+
+    tickets_summary = await manage_tickets(tickets, account_url=run.jira_config_data["account_url"], email=run.jira_config_data["email"], api_token=run.jira_config_data["api_token"])
+    await summaries_collection.update_one(
+        {"_id": run.summary_id},
+        {"$set": {f"{run.timestamp}.{user['accountId']}": tickets_summary}}
+    )
+    await validate_tickets(summaries={user["accountId"]: tickets_summary}, input_details=run.input_details)
+    return tickets_summary
+
+
 @router.post("/project/manager/perform")
 async def get_user_details(input_details: ProjectDetails):
     try:
+        set_project(input_details.projectId)
         existing_record = await project_details_collection.find_one({"projectId": input_details.projectId})
         if existing_record:
             await project_details_collection.update_one(
@@ -246,53 +265,35 @@ async def get_user_details(input_details: ProjectDetails):
         else:
             await project_details_collection.insert_one(input_details.model_dump())
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url=f"{env.klot_data_service_url}/actions/jira/config/{input_details.jira_connector_id}", headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            configuration = response.json()
-            jira_config_data = configuration.get("config", {}).get("config", {})
-        # Calculate the time N hours ago in Jira datetime format (YYYY-MM-DD HH:MM)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{env.klot_data_service_url}/actions/slack/config/{input_details.slack_connector_id}", headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            configuration = response.json()
-            slack_config_data = configuration.get("config", {}).get("config", {})
+        jira_config_data = await get_connector_config("jira", input_details.jira_connector_id)
+        slack_config_data = await get_connector_config("slack", input_details.slack_connector_id)
 
         users_data = []
         temp_users_data = []
-        headers = {
-            "Accept": "application/json",
-        }
         account_url = jira_config_data["account_url"]
-        search_url = f"{account_url}/rest/api/3/users/search"
 
         email = jira_config_data["email"]
         token = jira_config_data["api_token"]
+        jira = JiraClient(account_url, email, token)
 
-        response = requests.get(search_url, headers=headers, auth=(email, token))
-
-
-        jira_response = response.json()
+        jira_response = await jira.list_all_users()
         temp_users_data = [user for user in jira_response if user.get("accountType") == "atlassian"]
         accountIds = [user["accountId"] for user in temp_users_data]
-        for account_id in accountIds:
-            search_url = f"{account_url}/rest/api/3/user?accountId={account_id}"
-            response = requests.get(search_url, headers=headers,auth=(email, token))
-            user_data = response.json()
-            users_data.append(user_data if user_data.get("active") else None)
+        hydrated_users = await jira.bulk_users_batched(accountIds)
+        users_data = [user_data for user_data in hydrated_users if user_data.get("active")]
         
-        token = slack_config_data["user_token"] if slack_config_data["user_token"] else slack_config_data["bot_token"]
+        slack_token = slack_config_data["user_token"] if slack_config_data["user_token"] else slack_config_data["bot_token"]
         slack_headers = {
-                "Authorization": f"Bearer {token}",
+                "Authorization": f"Bearer {slack_token}",
                 "Content-Type": "application/json",
             }
+        slack_client = http_clients.get("slack")
         for user in users_data:
             user["projectId"] = input_details.projectId
             user_email = user.get('emailAddress') if user.get('emailAddress') else None
 
             if user_email is not None:
-                slack_url = f"https://slack.com/api/users.lookupByEmail?email={user_email}"
-                response = requests.get(slack_url, headers=slack_headers)
+                response = await slack_client.get("https://slack.com/api/users.lookupByEmail", params={"email": user_email}, headers=slack_headers)
                 slack_user = response.json()
 
                 if not slack_user["user"]["is_bot"] and slack_user["user"]["is_email_confirmed"] and not slack_user["user"]["deleted"] and not slack_user["user"]["is_app_user"]:
@@ -313,20 +314,31 @@ async def get_user_details(input_details: ProjectDetails):
             for user in users_to_insert:
                 user["projectId"] = input_details.projectId
                 await users_collection.insert_one(user)
-        summary_details =  {}
         retrieved_users_data = await users_collection.find({"projectId": input_details.projectId, "emailAddress" : {"$ne": None}}).to_list(None)
-        for user in retrieved_users_data:
-            tickets = await get_tickets_last_n_hours(jira_config_data, user["accountId"], input_details.hours)
-            print("tickets", tickets)
-            if len(tickets) != 0:
-
-                tickets_summary = await manage_tickets(tickets, account_url=account_url, email=email, api_token=token)
-                summary_details[user["accountId"]] = tickets_summary
-        day_summary = {datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S"): summary_details}
-
-        await summaries_collection.insert_one(day_summary)
+        tickets_by_assignee = await get_tickets_for_assignees(
+            jira_config_data, [user["accountId"] for user in retrieved_users_data], input_details.hours
+        )
 
-        await validate_tickets(summaries=summary_details, input_details=input_details)
+        # The day summary is stored upfront and every member's summary is added as it completes
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        day_summary = await summaries_collection.insert_one({timestamp: {}})
+        run = MemberPipelineRun(
+            jira_config_data=jira_config_data,
+            input_details=input_details,
+            summary_id=day_summary.inserted_id,
+            timestamp=timestamp,
+        )
+
+        results = await asyncio.gather(
+            *(
+                run_member_pipeline(user, tickets_by_assignee[user["accountId"]], run)
+                for user in retrieved_users_data
+            ),
+            return_exceptions=True,
+        )
+        for user, result in zip(retrieved_users_data, results):
+            if isinstance(result, BaseException):
+                logging.warning("Member pipeline failed for %s: %r", user["accountId"], result)
 
         return "completed"
 
@@ -342,7 +354,7 @@ async def blocker_call(data: BlockerData):
     try:
         projectId_check = f"""from the content available {data}, find the projectId value which is sent by the agent, send the projectId value only as string value, do not return anything else"""
         payload = {
-            "model": "azure/gpt-4o",
+            **model_routing.payload("project_id_extraction"),
             "messages": [
                 {
                     "role": "user",
@@ -353,34 +365,22 @@ async def blocker_call(data: BlockerData):
         llm_caller = LLMCaller(payload)
         response = await llm_caller.llm_unstructured_completion()
         projectId = response.response
+        set_project(projectId)
         user_details = await project_details_collection.find_one({"user_id": data.user_id})
         if user_details is None:
             raise HTTPException(status_code=404, detail="User not found")
         jira_connector_id = user_details.get("jira_connector_id")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url=f"{env.klot_data_service_url}/actions/jira/config/{jira_connector_id}", headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            configuration = response.json()
-            jira_config_data = configuration.get("config", {}).get("config", {})
-        
-        headers = {
-            "Accept": "application/json",
-        }
-        account_url = jira_config_data["account_url"]
-        search_url = f"{account_url}/rest/api/3/users/search"
-
-        email = jira_config_data["email"]
-        token = jira_config_data["api_token"]
-
-        response = requests.get(search_url, headers=headers, auth=(email, token))
+        jira_config_data = await get_connector_config("jira", jira_connector_id)
+        jira = JiraClient.from_config(jira_config_data)
+        jira_users = await get_roster(jira)
 
-        user_names = [user["displayName"] for user in response.json()]
+        user_names = [user["displayName"] for user in jira_users if user.get("displayName")]
 
 
         content = f"""from the content available {data}, find the name of the user who has been the blocker for the user matching with the names provided {user_names}, return only the name as it is provided matching with the content, return the complete name matched with the name as provided in the content"""
         payload = {
-            "model": "azure/gpt-4o",
+            **model_routing.payload("blocker_user_matching"),
             "messages": [
                 {
                     "role": "user",
@@ -423,29 +423,7 @@ class TicketsData(BaseModel):
 
 async def manage_ticket(tickets: dict):
     try:
-        tickets_summary = {}
-        if tickets:
-            for ticket in tickets:
-
-                print("ticket", ticket["key"])
-                content = f"""
-                    you are a ai project manager, you have a ticket with the following details: {ticket},
-                    your task is to find if the ticket is up to date , being updated by developer timely and if the ticket is being resolved in time also check the ticket status according to the comments made by the developer with considering the due date and the time of the ticket creation with time logs, if things are fine with ticket return None else return the concerns to be resolved as a string value"""
-                payload = {
-                    "model": "azure/gpt-4o",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": content,
-                        },
-                    ],
-                }
-                llm_caller = LLMCaller(payload)
-                response = await llm_caller.llm_unstructured_completion()
-                summary_of_ticket = response.response
-                if summary_of_ticket:
-                    tickets_summary[ticket["key"]] = summary_of_ticket
-        return tickets_summary
+        return await collect_ticket_summaries(tickets)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -456,17 +434,25 @@ async def tickets_summary_generator(tickets: TicketsData):
         if user is None:
             raise HTTPException(status_code=404, detail="User Details not found")
         jira_connector_id = user.get("jira_connector_id")
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url=f"{env.klot_data_service_url}/actions/jira/config/{jira_connector_id}", headers={"x-server-key": env.web_server_secret})
-            response.raise_for_status()
-            configuration = response.json()
-            jira_config_data = configuration.get("config", {}).get("config", {})
-        for ticket in tickets.tickets:
-            account_url = ticket["account_url"]
-            email = jira_config_data["email"]
-            api_token = jira_config_data["api_token"]
-            summary_of_ticket = await manage_tickets(tickets=response.json(), account_url=account_url, email=email, api_token=api_token)
-            return summary_of_ticket
+        jira_config_data = await get_connector_config("jira", jira_connector_id)
+        # Jira accepts the issue id wherever an issue key is expected
+        tickets_data = [{**ticket.model_dump(), "key": ticket.id} for ticket in tickets.tickets or []]
+        return await manage_tickets(tickets=tickets_data, account_url=jira_config_data["account_url"], email=jira_config_data["email"], api_token=jira_config_data["api_token"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/connector/config/cache")
+async def invalidate_connector_config_cache(
+    connector_type: Optional[str] = None,
+    connector_id: Optional[str] = None,
+    _: AuthenticatedUser = Depends(system_call),
+):
+    """
+    Drop cached connector configurations so the next request re-fetches them.
+    """
+    try:
+        removed = invalidate_connector_config(connector_type=connector_type, connector_id=connector_id)
+        return {"invalidated": removed}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,17 +1,33 @@
 import json
-from typing import Optional
+import logging
+import time
+from typing import Any, Dict, Optional
 
 import httpx
 import litellm
-import redis
-import requests
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 import env as config
+from server.chat_history import get_session, history_compactor, prompt_messages
+from server.common.connectors.config_cache import get_connector_config
+from server.common.database.mongodb import client as mongodb
+from server.common.intent_router import classify_intent, log_model_intent
+from server.common.jira.client import JiraClient
+from server.common.jira.jql_cache import jql_cache_key, jql_queries
+from server.common.jira.roster import get_roster
+from server.common.request_context import set_project
+from server.config.collections import collections
+from server.config.llm_caller import LLMCaller
+from server.config.llm_limits import estimate_tokens, llm_limiters
+from server.config.llm_usage import LLMUsage, usage_writer
+from server.config.model_routing import model_routing
 
 router = APIRouter()
 
+users_collection = mongodb.db[collections.users]
+
 _headers = {
     'stsk': config.web_server_secret,
     'x-server-key': config.web_server_secret,
@@ -27,31 +43,33 @@ class UnstructuredLiteLLMCompletionResponse(BaseModel):
     tries: int
 
 
-# Redis for session-based chat history
-redis_client = redis.Redis(
-    host='redis-15082.c56.east-us.azure.redns.redis-cloud.com',
-    password='1wNZNp0FW09f7zhIkncOudeduHo3DF2k',
-    port=15082,
-    decode_responses=True,
-)
-
-
 # Data Model for Chat Requests
 class ChatRequest(BaseModel):
     session_id: str
     model_name: str  # Choose from LLM_MODELS (e.g., "claude", "gpt-4")
     message: str
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
 
+    def completion_params(self) -> Dict[str, Any]:
+        return self.model_dump(include={'max_tokens', 'temperature'}, exclude_none=True)
 
-# Helper function to store chat history in Redis
-def save_session(session_id, history):
-    redis_client.set(session_id, json.dumps(history))
 
+def record_usage(model_name, response, latency):
+    usage_writer.record(
+        LLMUsage(
+            model=model_name,
+            prompt_tokens=response['usage']['prompt_tokens'],
+            completion_tokens=response['usage']['completion_tokens'],
+            total_tokens=response['usage']['total_tokens'],
+            latency=latency,
+        )
+    )
 
-# Helper function to retrieve chat history
-def get_session(session_id):
-    data = redis_client.get(session_id)
-    return json.loads(data) if data else []
+
+def sse_event(data, event=None):
+    lines = f'event: {event}\n' if event else ''
+    return f'{lines}data: {json.dumps(data)}\n\n'
 
 
 # API Endpoint to Handle Chat
@@ -60,14 +78,14 @@ async def chat_with_llm(
     chat_request: ChatRequest,
 ) -> UnstructuredLiteLLMCompletionResponse:
     session_id = chat_request.session_id
-    model_name = chat_request.model_name.lower() or 'azure/gpt-4o'
+    model_name = chat_request.model_name.lower() or config.llm_default_model
     message = chat_request.message
 
     # Retrieve previous chat history
-    chat_history = get_session(session_id) or []
+    chat_history = await get_session(session_id) or []
 
     # Append user message to chat history
-    messages = chat_history if isinstance(chat_history, list) else []
+    messages = prompt_messages(chat_history) if isinstance(chat_history, list) else []
 
     # Append the new user message
     messages.append(
@@ -75,54 +93,159 @@ async def chat_with_llm(
     )  # Ensure content is a string
 
     try:
-        # Call LiteLLM directly
-        response = await litellm.acompletion(
-            api_key=config.litellm_proxy_api_key,
-            base_url=config.litellm_proxy_api_base,
-            model=model_name or 'azure/gpt-4o',
-            messages=messages,
-        )
+        # Rate limited, retried and recorded like every other completion
+        payload = {
+            'model': model_name,
+            'messages': messages,
+            **chat_request.completion_params(),
+        }
+        response = await LLMCaller(payload).llm_unstructured_completion()
 
-        assistant_response = response['choices'][0]['message']['content']
+        # Save the turn now and summarize the reply for the history in the background
+        await history_compactor.save_turn(session_id, message, response.response)
 
-        # Summarize response for shorter context retention
-        summary_response = await litellm.acompletion(
-            api_key=config.litellm_proxy_api_key,
-            base_url=str(config.litellm_proxy_api_base),
-            model=model_name or 'azure/gpt-4o',
-            messages=[
-                {
-                    'role': 'system',
-                    'content': 'Summarize the response while keeping key details.',
-                },
-                {'role': 'user', 'content': assistant_response},
-            ],
+        return UnstructuredLiteLLMCompletionResponse(
+            **response.model_dump(exclude={'cached'})
         )
 
-        summarized_content = summary_response['choices'][0]['message']['content']
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Append assistant response to chat history
-        chat_history.append({'role': 'assistant', 'content': summarized_content})
 
-        # Save updated chat history
-        save_session(session_id, chat_history)
+@router.post('/chat/stream')
+async def stream_chat_with_llm(chat_request: ChatRequest) -> StreamingResponse:
+    """
+    Stream the reply to a chat message as server-sent events.
 
-        return UnstructuredLiteLLMCompletionResponse(
-            response=response['choices'][0]['message']['content'],
-            completion_tokens=response['usage']['completion_tokens'],
-            prompt_tokens=response['usage']['prompt_tokens'],
-            total_tokens=response['usage']['total_tokens'],
-            tries=1,
-        )
+    Every event carries a 'content' delta of the reply, and a final 'done' event
+    carries the token usage. The turn is saved to the session history before the
+    'done' event is sent.
+    """
+    session_id = chat_request.session_id
+    model_name = chat_request.model_name.lower() or config.llm_default_model
 
+    # Retrieve previous chat history
+    chat_history = await get_session(session_id) or []
+    messages = prompt_messages(chat_history) if isinstance(chat_history, list) else []
+    messages.append({'role': 'user', 'content': str(chat_request.message)})
+
+    params = chat_request.completion_params()
+    try:
+        await llm_limiters.get(model_name).acquire(estimate_tokens(messages, params))
+        started = time.monotonic()
+        stream = await litellm.acompletion(
+            api_key=config.litellm_proxy_api_key,
+            base_url=str(config.litellm_proxy_api_base),
+            model=model_name,
+            messages=messages,
+            **params,
+            stream=True,
+            stream_options={'include_usage': True},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def events():
+        parts = []
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield sse_event({'content': chunk.choices[0].delta.content})
+                usage = getattr(chunk, 'usage', None) or usage
+        except Exception as e:
+            logging.warning('Chat stream for %s failed: %s', session_id, e)
+            yield sse_event({'detail': str(e)}, event='error')
+            return
+
+        usage = {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0),
+            'completion_tokens': getattr(usage, 'completion_tokens', 0),
+            'total_tokens': getattr(usage, 'total_tokens', 0),
+        }
+        # Clients close the stream on 'done', so the turn is saved before it
+        record_usage(model_name, {'usage': usage}, time.monotonic() - started)
+        try:
+            await history_compactor.save_turn(
+                session_id, chat_request.message, ''.join(parts)
+            )
+        except Exception as e:
+            logging.warning('Could not save the history of %s: %s', session_id, e)
+
+        yield sse_event(usage, event='done')
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 
 class UserQueryDetails(BaseModel):
     user_query: str
 
 
+class JiraTicketDraft(BaseModel):
+    project_key: str
+    summary: str
+    description: str
+    issuetype: str
+    assignee_id: Optional[str] = None
+    reporter_id: Optional[str] = None
+
+
+class JiraTicketReference(BaseModel):
+    ticket_key: str
+    ticket_project_key: str
+
+
+async def structured_chat(session, message, response_model):
+    """
+    Ask for a reply validated against the model, with the session history as context.
+
+    The turn is saved to the session history like a /chat turn.
+    """
+    history = prompt_messages(await get_session(session) or []) if session else []
+    route = model_routing.route('ticket_draft')
+    payload = {
+        **route.payload(),
+        'messages': [*history, {'role': 'user', 'content': str(message)}],
+    }
+    response = await LLMCaller(payload).llm_structured_completion(response_model)
+    if session:
+        await history_compactor.save_turn(
+            session, message, response.parsed.model_dump_json()
+        )
+    return response.parsed
+
+
+async def routed_chat(task: str, session: Optional[str], message: str):
+    """
+    Send a task prompt through /chat with the model, token cap and temperature of its route.
+    """
+    route = model_routing.route(task)
+    chat_request = ChatRequest(
+        session_id=session or None,
+        model_name=route.model,
+        max_tokens=route.max_tokens,
+        temperature=route.temperature,
+        message=message,
+    )
+    return await chat_with_llm(chat_request=chat_request)
+
+
+async def set_connector_project(connector_id: str):
+    """
+    Attribute the request to the project owning the Jira connector, if any.
+    """
+    owner = await users_collection.find_one(
+        {'jira_connector_id': connector_id}, {'projectId': 1}
+    )
+    if owner is not None:
+        set_project(owner.get('projectId'))
+
+
 @router.post('/chat/{connector_id}')
 async def query_on_jira(
     connector_id: str,
@@ -130,32 +253,14 @@ async def query_on_jira(
     session: Optional[str] = None,
 ):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url=f'{config.klot_data_service_url}/actions/jira/config/{connector_id}',
-                headers={'x-server-key': config.web_server_secret},
-            )
-            response.raise_for_status()
-            configuration = response.json()
-            jira_config_data = configuration.get('config', {}).get('config', {})
-        headers = {
-            'Accept': 'application/json',
-        }
-        account_url = jira_config_data['account_url']
-        search_url = f'{account_url}/rest/api/3/users/search'
-
-        email = jira_config_data['email']
-        token = jira_config_data['api_token']
-
-        response = requests.get(search_url, headers=headers, auth=(email, token))
-
-        jira_response = response.json()
-        temp_users_data = [
-            user for user in jira_response if user.get('accountType') == 'atlassian'
-        ]
+        jira_config_data = await get_connector_config('jira', connector_id)
+        jira = JiraClient.from_config(jira_config_data)
+        await set_connector_project(connector_id)
 
         if user_query_details.user_query:
-            find_action = f"""
+            action = classify_intent(user_query_details.user_query)
+            if action is None:
+                find_action = f"""
 based on the query priovided by the user {user_query_details.user_query} find whether the user is asking to create a jira ticket or delete a ticket or update a ticket or find tickets,
 
 If the user is asking to create a jira ticket, return the string "create"
@@ -163,18 +268,15 @@ If the user is asking to find tickets, return the string "find"
 If the user is asking to delete a ticket, return the string "delete"
 If the user is not asking to create a jira ticket, delete a ticket or find tickets, return the string "not_found"
 Return only the string and nothing else, do not include any additional information or metadata.
-            """
-            chat_request = ChatRequest(
-                session_id=session or None,
-                model_name='azure/gpt-4o',
-                message=find_action,
-            )
-            response = await chat_with_llm(chat_request=chat_request)
-            action = response.response
+                """
+                response = await routed_chat('intent_detection', session, find_action)
+                action = response.response
+                log_model_intent(user_query_details.user_query, action)
 
             print('action', action)
 
             if action == 'create':
+                temp_users_data = await get_roster(jira)
                 jira_data = f"""
 based on the content provided by the user {user_query_details.user_query} generate the necessary details for creating a jira ticket,
 here are the users names find the assignee, reporter for the ticket {temp_users_data}, put the accountId value of matching names or email id values provided by the user for assignee, reporter
@@ -188,68 +290,38 @@ the details should be in the following format:
         "reporter_id": accountId value of the reporter which is matched to the provided data
 Return only the stringified json and nothing else, do not include any additional information or metadata.
 """
-                chat_request = ChatRequest(
-                    session_id=session or None,
-                    model_name='azure/gpt-4o',
-                    message=jira_data,
-                )
-                response = await chat_with_llm(chat_request=chat_request)
-                jira_data = response.response
+                jira_data = await structured_chat(session, jira_data, JiraTicketDraft)
 
                 print('jira_data', jira_data)
 
-                jira_data = json.loads(jira_data)
-                project_key = jira_data['project_key']
-                summary = jira_data['summary']
-                description = jira_data['description']
-                issue_type = jira_data['issuetype']
-                assignee_id = jira_data['assignee_id']
-                reporter_id = jira_data['reporter_id']
-
-                # Construct URL for creating a ticket
-                url = f'{account_url}/rest/api/3/issue'
-
-                # Prepare headers
-                headers = {
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json',
-                }
-
-                # Construct payload for creating a ticket
-                payload = {
-                    'fields': {
-                        'project': {'key': f'{project_key}'},
-                        'summary': summary,
-                        'description': {
-                            'type': 'doc',
-                            'version': 1,
-                            'content': [
-                                {
-                                    'type': 'paragraph',
-                                    'content': [{'text': description, 'type': 'text'}],
-                                }
-                            ],
-                        },
-                        'issuetype': {'name': f'{issue_type}'},
-                        'assignee': {'accountId': f'{assignee_id}'},
-                        'reporter': {'accountId': f'{reporter_id}'},
-                    }
+                project_key = jira_data.project_key
+                summary = jira_data.summary
+                description = jira_data.description
+                issue_type = jira_data.issuetype
+                assignee_id = jira_data.assignee_id
+                reporter_id = jira_data.reporter_id
+
+                # Construct fields for creating a ticket
+                fields = {
+                    'project': {'key': f'{project_key}'},
+                    'summary': summary,
+                    'description': {
+                        'type': 'doc',
+                        'version': 1,
+                        'content': [
+                            {
+                                'type': 'paragraph',
+                                'content': [{'text': description, 'type': 'text'}],
+                            }
+                        ],
+                    },
+                    'issuetype': {'name': f'{issue_type}'},
+                    'assignee': {'accountId': f'{assignee_id}'},
+                    'reporter': {'accountId': f'{reporter_id}'},
                 }
 
-                # Make POST request to create a ticket
-                response = requests.post(
-                    url,
-                    headers=headers,
-                    auth=(email, token),
-                    json=payload,
-                )
-                response.raise_for_status()
-
-                if response.status_code == 201:
-                    return response.json()
-                else:
-                    return f'Error creating Jira ticket: {response.text}'
-            elif action == 'delete':
+                return await jira.create_issue(fields)
+            if action == 'delete':
                 if user_query_details.user_query:
                     prompt = f"""
 based on the content provided by the user {user_query_details.user_query} generate the necessary details for deleting a jira ticket,find the ticket key for the ticket along with the project key which the ticket belongs
@@ -259,71 +331,41 @@ ticket_project_key: the project key of the ticket to be deleted
 
 Return only the stringified json and nothing else, do not include any additional information or metadata.
 """
-                    chat_request = ChatRequest(
-                        session_id=session or None,
-                        model_name='azure/gpt-4o',
-                        message=prompt,
+                    jira_data = await structured_chat(
+                        session, prompt, JiraTicketReference
                     )
-                    response = await chat_with_llm(chat_request=chat_request)
-                    jira_data = response.response
                     print('jira_data', jira_data)
-                    jira_data = json.loads(jira_data)
-                    ticket_key = jira_data['ticket_key']
-                    ticket_project_key = jira_data['ticket_project_key']
-                    # Construct URL for deleting a ticket
-                    url = f'{account_url}/rest/api/3/issue/{ticket_key}'
-
-                    # Prepare headers
-                    headers = {
-                        'Accept': 'application/json',
-                        'Content-Type': 'application/json',
-                    }
-
-                    # Make DELETE request to delete a ticket
-                    response = requests.delete(
-                        url,
-                        headers=headers,
-                        auth=(email, token),
-                    )
-                    response.raise_for_status()
+                    ticket_key = jira_data.ticket_key
+                    ticket_project_key = jira_data.ticket_project_key
 
-                    if response.status_code == 204:
-                        return f'Jira ticket with key {ticket_key} in project {ticket_project_key} has been deleted.'
-                    else:
-                        return f'Error deleting Jira ticket: {response.text}'
+                    await jira.delete_issue(ticket_key)
+                    return f'Jira ticket with key {ticket_key} in project {ticket_project_key} has been deleted.'
             elif action == 'find':
-                if user_query_details.user_query:
+                cache_key = jql_cache_key(connector_id, user_query_details.user_query)
+                jql_query = jql_queries.get(cache_key)
+                if jql_query is None:
+                    temp_users_data = await get_roster(jira)
                     message_check = f"""Convert the following user request into a valid Jira Query Language (JQL) query: {user_query_details.user_query}. Ensure the generated JQL query is syntactically correct and does not throw any errors. Use {temp_users_data} to match user details such as accountId, email, or name.
 
         If the query involves a field that requires an operator, use only the valid JQL operators: =, !=, <, >, <=, >=, ~, !~, IN, NOT IN, IS, IS NOT.
         If the query involves a field that should not be empty, use IS NOT NULL instead of IS NOT EMPTY.
         Ensure field names are correct as per Jira's schema.
         Return only the JQL query as a string and nothing else, do not include any additional information or metadata. do  not even mention jql , just return the JQL query generated as string"""
-                    chat_request = ChatRequest(
-                        session_id=session or None,
-                        model_name='azure/gpt-4o',
-                        message=message_check,
+                    response = await routed_chat(
+                        'jql_generation', session, message_check
                     )
-                    response = await chat_with_llm(chat_request=chat_request)
                     jql_query = response.response
 
                     print('jql_query', jql_query)
 
-                account_url = jira_config_data['account_url']
-
-                email = jira_config_data['email']
-                token = jira_config_data['api_token']
-
-                url = f'{account_url}/rest/api/3/search'
-                headers = {'Accept': 'application/json'}
-                auth = (email, token)
-                params = {'jql': jql_query, 'maxResults': 10}
-
-                response = requests.get(url, headers=headers, params=params, auth=auth)
-
-                if response.status_code == 200:
-                    return response.json()['issues']
-                else:
-                    return f'Error fetching Jira tickets: {response.text}'
+                try:
+                    search_result = await jira.search(jql_query, max_results=10)
+                except httpx.HTTPStatusError as e:
+                    # A JQL error means the cached or generated query is unusable
+                    if e.response.status_code == 400:
+                        jql_queries.invalidate(cache_key)
+                    return f'Error fetching Jira tickets: {e.response.text}'
+                jql_queries.set(cache_key, jql_query)
+                return search_result['issues']
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,17 +1,28 @@
 import datetime
 import json
-from typing import Literal, Optional
+import logging
+import re
+from functools import partial
+from typing import Literal, Optional, Tuple
 
 import httpx
-import requests
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from temporalio.client import Client
 
 import env
+from server.common.connectors.config_cache import get_connector_config
 from server.common.database.mongodb import client as mongodb
+from server.common.http.clients import registry as http_clients
+from server.common.jira.client import TICKET_FIELDS, JiraClient
+from server.common.name_index import NameIndex, name_indexes, pick_name
+from server.common.prompt_compactor import compact_call, render
+from server.common.request_context import set_project
 from server.config.collections import collections
 from server.config.llm_caller import LLMCaller
+from server.config.model_routing import model_routing
+from server.config.prompt_budgets import prompt_budgets
+from server.ticket_summaries import collect_ticket_summaries
 
 # from server.temporal.workflow import UserCallsWorkflow
 
@@ -46,6 +57,11 @@ class UserDetails(BaseModel):
     token: str
 
 
+class EmailDraft(BaseModel):
+    subject: str
+    body: str
+
+
 async def send_email_to_master(email_id: str, content: str, email_connector_id: str):
     try:
         blocker_prompt = f"""
@@ -58,7 +74,7 @@ async def send_email_to_master(email_id: str, content: str, email_connector_id:
             return the output as stringified json value of these fields in a dict, return only the stringified json value only, do not return anything else, do not mention anything, do not even mention json also, just return the stringified json value
             """
         payload = {
-            'model': 'azure/gpt-4o',
+            **model_routing.payload('email_draft'),
             'messages': [
                 {
                     'role': 'user',
@@ -67,65 +83,62 @@ async def send_email_to_master(email_id: str, content: str, email_connector_id:
             ],
         }
         llm_caller = LLMCaller(payload)
-        response = await llm_caller.llm_unstructured_completion()
-        content = response.response
-        email = json.loads(content)
-        body = email['body']
-        subject = email['subject']
-
-        async with httpx.AsyncClient(timeout=600) as client:
-            json_data = {
-                'subject': subject,
-                'recipient_emails': [email_id],
-                'body': body,
-            }
-            headers = {'x-server-key': env.web_server_secret}
-            print('Request JSON:', json_data)
-            print('Request Headers:', headers)
-            response = await client.post(
-                f'{env.klot_data_service_url}/actions/email/send/{email_connector_id}',
-                json=json_data,
-                headers=headers,
-            )
-            print('Response Status Code:', response.status_code)
-            print('Response Content:', response.text)
-            response.raise_for_status()
-            return response.json()
+        response = await llm_caller.llm_structured_completion(EmailDraft)
+        body = response.parsed.body
+        subject = response.parsed.subject
+
+        client = http_clients.get('data_service')
+        json_data = {
+            'subject': subject,
+            'recipient_emails': [email_id],
+            'body': body,
+        }
+        headers = {'x-server-key': env.web_server_secret}
+        print('Request JSON:', json_data)
+        print('Request Headers:', headers)
+        response = await client.post(
+            f'{env.klot_data_service_url}/actions/email/send/{email_connector_id}',
+            json=json_data,
+            headers=headers,
+            timeout=600,
+        )
+        print('Response Status Code:', response.status_code)
+        print('Response Content:', response.text)
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 async def make_call(phone_number: str, content: str, voice_connector_id: str):
     try:
-        async with httpx.AsyncClient() as client:
-            data = {
-                'phone_number': phone_number,
-                'initial_prompt': content,
-                'message': 'Hello! This is Mario - your AI project Manager calling to understand the status of the tickets you are working on',
-            }
-            print('data', data)
-            response = await client.post(
-                f'{env.klot_data_service_url}/actions/voice/make_call/{voice_connector_id}',
-                json=data,
-                headers={'x-server-key': env.web_server_secret},
-            )
-            response.raise_for_status()
-            return response.json()
+        client = http_clients.get('data_service')
+        data = {
+            'phone_number': phone_number,
+            'initial_prompt': content,
+            'message': 'Hello! This is Mario - your AI project Manager calling to understand the status of the tickets you are working on',
+        }
+        print('data', data)
+        response = await client.post(
+            f'{env.klot_data_service_url}/actions/voice/make_call/{voice_connector_id}',
+            json=data,
+            headers={'x-server-key': env.web_server_secret},
+        )
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_tickets_last_n_hours(
-    account_url: str, email: str, token: str, user_id: str, n: int
-):
+async def iter_tickets_last_n_hours(jira: JiraClient, user_id: str, n: int):
     """
-    Fetch tickets updated in the last 'n' hours.
+    Stream tickets updated in the last 'n' hours, page by page.
+
+    Only the fields in TICKET_FIELDS are requested. A failing search ends the
+    stream instead of raising.
     """
     n = int(n)
 
-    headers = {
-        'Accept': 'application/json',
-    }
     time_n_hours_ago = (
         datetime.datetime.utcnow() - datetime.timedelta(hours=n)
     ).strftime('%Y-%m-%d %H:%M')
@@ -133,14 +146,13 @@ async def get_tickets_last_n_hours(
     # Jira Query Language (JQL) to filter issues updated in the last 'n' hours
     jql_query = f'assignee = "{user_id}" AND updated >= "{time_n_hours_ago}" ORDER BY updated DESC'
 
-    search_url = f'{account_url}/rest/api/2/search?jql={jql_query}'
-
-    response = requests.get(search_url, headers=headers, auth=(email, token))
-
-    if response.status_code == 200:
-        return response.json().get('issues', [])
-
-    return []
+    try:
+        async for issue in jira.iter_search(
+            jql_query, fields=TICKET_FIELDS, api_version='2'
+        ):
+            yield issue
+    except httpx.HTTPError as e:
+        logging.warning('Jira search for %s failed: %s', user_id, e)
 
 
 async def manage_tickets(tickets: list, account_url: str, email: str, api_token: str):
@@ -148,39 +160,8 @@ async def manage_tickets(tickets: list, account_url: str, email: str, api_token:
     Manage the tickets and return the concerns.
     """
     try:
-        tickets_summary = {}
-        if tickets:
-            for ticket in tickets:
-                print('ticket', ticket['key'])
-                key = ticket['key']
-                url = f'{account_url}/rest/api/3/issue/{key}'
-
-                # Prepare headers
-                headers = {
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json',
-                }
-
-                # Make GET request to retrieve ticket details
-                response = requests.get(url, headers=headers, auth=(email, api_token))
-                content = f"""
-                    you are a ai project manager, you have a ticket with the following details: {ticket},
-                    your task is to find if the ticket is up to date , being updated by developer timely and if the ticket is being resolved in time also check the ticket status according to the comments made by the developer with considering the due date and the time of the ticket creation with time logs, if things are fine with ticket return None else return the concerns to be resolved as a string value"""
-                payload = {
-                    'model': 'azure/gpt-4o',
-                    'messages': [
-                        {
-                            'role': 'user',
-                            'content': content,
-                        },
-                    ],
-                }
-                llm_caller = LLMCaller(payload)
-                response = await llm_caller.llm_unstructured_completion()
-                summary_of_ticket = response.response
-                if summary_of_ticket:
-                    tickets_summary[ticket['key']] = summary_of_ticket
-        return tickets_summary
+        jira = JiraClient(account_url, email, api_token)
+        return await collect_ticket_summaries(tickets, jira=jira)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,36 +177,19 @@ async def summarize_tickets(
 ):
     try:
         if accountId is None:
-            url = f'{jira_account_url}/rest/api/3/user/search'
+            jira = JiraClient(jira_account_url, email, token)
 
-            # Prepare headers
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-            }
-
-            # Prepare query parameters
-            params = {'query': email_id}
-
-            # Make GET request to search users
-            response = requests.get(
-                url,
-                headers=headers,
-                auth=(email, token),
-                params=params,
-            )
-            response.raise_for_status()
-
-            # Parse the response
-            response_data = response.json()
-            accountId = response_data['accountId']
+            # Search the Jira user matching the email id
+            matched_users = await jira.find_users(email_id)
+            if not matched_users:
+                return None
+            accountId = matched_users[0]['accountId']
             if n == 0:
                 return None
 
-            tickets = await get_tickets_last_n_hours(
-                jira_account_url, email, token, accountId, n
-            )
-            return manage_tickets(tickets, jira_account_url, email, token)
+            # Tickets are summarized while the remaining search pages are fetched
+            tickets = iter_tickets_last_n_hours(jira, accountId, n)
+            return await manage_tickets(tickets, jira_account_url, email, token)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -255,59 +219,43 @@ async def update_jira_details_table(user_id: str):
         users_tables = user['table_details']
         projectID = user['projectId']
         jira_connector_id = user['jira_connector_id']
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url=f'{env.klot_data_service_url}/actions/jira/config/{jira_connector_id}',
-                headers={'x-server-key': env.web_server_secret},
-            )
-            response.raise_for_status()
-            configuration = response.json()
-            jira_config_data = configuration.get('config', {}).get('config', {})
-            account_url = jira_config_data['account_url']
-            email = jira_config_data['email']
-            api_token = jira_config_data['api_token']
+        client = http_clients.get('data_service')
+        jira_config_data = await get_connector_config('jira', jira_connector_id)
+        account_url = jira_config_data['account_url']
+        email = jira_config_data['email']
+        api_token = jira_config_data['api_token']
+        jira = JiraClient(account_url, email, api_token)
         for user_table in users_tables:
             if user_table['table_name'] == 'Team Members':
                 table_id = user_table['table_id']
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
-                        headers={'x-server-key': env.web_server_secret},
-                    )
-                    response.raise_for_status()
-                    users = response.json()
-
-                    for user in users:
-                        async with httpx.AsyncClient() as inner_client:
-                            url = f'{account_url}/rest/api/3/user/search'
-
-                            # Prepare headers
-                            headers = {
-                                'Accept': 'application/json',
-                                'Content-Type': 'application/json',
-                            }
-
-                            # Prepare query parameters
-                            params = {'query': user['emailAddress']}
-
-                            # Make GET request to search users
-                            inner_response = await inner_client.get(
-                                url,
-                                headers=headers,
-                                auth=(email, api_token),
-                                params=params,
-                            )
-                            if inner_response.status_code == 200:
-                                user_detail = inner_response.json()
-                                combined_user = {**user, **user_detail}
-                                user.update(combined_user)
-                                async with httpx.AsyncClient() as service_client:
-                                    record_id = str(user['_id'])
-                                    await service_client.put(
-                                        url=f'{env.klot_data_service_url}/storage/{projectID}/{table_id}/{record_id}',
-                                        json=user,
-                                        headers={'x-server-key': env.web_server_secret},
-                                    )
+                response = await client.get(
+                    f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
+                    headers={'x-server-key': env.web_server_secret},
+                )
+                response.raise_for_status()
+                users = response.json()
+
+                for user in users:
+                    # Search the Jira user matching the member's email
+                    try:
+                        matched_users = await jira.find_users(user['emailAddress'])
+                    except httpx.HTTPStatusError as e:
+                        logging.warning(
+                            'Jira user search failed for %s: %s',
+                            user['emailAddress'],
+                            e,
+                        )
+                        continue
+                    if matched_users:
+                        user.update(matched_users[0])
+                        record_id = str(user['_id'])
+                        await client.put(
+                            url=f'{env.klot_data_service_url}/storage/{projectID}/{table_id}/{record_id}',
+                            json=user,
+                            headers={'x-server-key': env.web_server_secret},
+                        )
+                # Team Members changed, so find_user rebuilds its name index
+                name_indexes.invalidate((projectID, table_id))
     except HTTPException:
         raise
     except Exception as e:
@@ -321,43 +269,35 @@ async def new_record_insertion(user_id: str, inserted_id: str):
         for table in users['table_details']:
             if table['table_name'] == 'Team Members':
                 table_id = table['table_id']
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{users["projectId"]}/{table_id}/{inserted_id}',
+                client = http_clients.get('data_service')
+                response = await client.get(
+                    f'{env.klot_data_service_url}/storage/{users["projectId"]}/{table_id}/{inserted_id}',
+                    headers={'x-server-key': env.web_server_secret},
+                )
+                response.raise_for_status()
+                user = response.json()
+                jira = JiraClient(
+                    users['account_url'], users['email'], users['api_token']
+                )
+
+                # Search the Jira user matching the member's email
+                try:
+                    matched_users = await jira.find_users(user['emailAddress'])
+                except httpx.HTTPStatusError as e:
+                    logging.warning(
+                        'Jira user search failed for %s: %s', user['emailAddress'], e
+                    )
+                    matched_users = []
+                if matched_users:
+                    user.update(matched_users[0])
+                    record_id = str(user['_id'])
+                    await client.put(
+                        url=f'{env.klot_data_service_url}/storage/{users["projectId"]}/{table_id}/{record_id}',
+                        json=user,
                         headers={'x-server-key': env.web_server_secret},
                     )
-                    response.raise_for_status()
-                    user = response.json()
-                    async with httpx.AsyncClient() as inner_client:
-                        url = f'{users["account_url"]}/rest/api/3/user/search'
-
-                        # Prepare headers
-                        headers = {
-                            'Accept': 'application/json',
-                            'Content-Type': 'application/json',
-                        }
-
-                        # Prepare query parameters
-                        params = {'query': user['emailAddress']}
-
-                        # Make GET request to search users
-                        inner_response = await inner_client.get(
-                            url,
-                            headers=headers,
-                            auth=(users['email'], users['api_token']),
-                            params=params,
-                        )
-                        if inner_response.status_code == 200:
-                            user_detail = inner_response.json()
-                            combined_user = {**user, **user_detail}
-                            user.update(combined_user)
-                            async with httpx.AsyncClient() as service_client:
-                                record_id = str(user['_id'])
-                                await service_client.put(
-                                    url=f'{env.klot_data_service_url}/storage/{users["projectId"]}/{table_id}/{record_id}',
-                                    json=user,
-                                    headers={'x-server-key': env.web_server_secret},
-                                )
+                # A new member is not in the cached name index of find_user yet
+                name_indexes.invalidate((users['projectId'], table_id))
     except HTTPException as e:
         raise e
 
@@ -369,18 +309,8 @@ async def make_call_using_bland(user_id: str, call_prompt: str, phone_number: st
             raise HTTPException(status_code=404, detail='User Details not found')
         if user_details.get('bland_connector_id'):
             bland_connector_id = user_details['bland_connector_id']
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url=f'{env.klot_data_service_url}/actions/bland/config/{bland_connector_id}',
-                    headers={'x-server-key': env.web_server_secret},
-                )
-                response.raise_for_status()
-                bland_configuration = response.json()
-                bland_api_key = (
-                    bland_configuration.get('config', {})
-                    .get('config', {})
-                    .get('authorization_key', '')
-                )
+            bland_config_data = await get_connector_config('bland', bland_connector_id)
+            bland_api_key = bland_config_data.get('authorization_key', '')
         else:
             bland_api_key = env.bland_api_key
 
@@ -393,6 +323,8 @@ async def make_call_using_bland(user_id: str, call_prompt: str, phone_number: st
             'phone_number': f'+{phone_number}',
             'voice': 'josh',
             'task': f'{call_prompt}, also send the user id value after the call {user_id}',
+            'metadata': {'user_id': user_id},
+            'request_data': {'user_id': user_id},
             'first_sentence': 'Hello There! This is Mario - your AI project Manager calling to understand the status of the task you are working on',
             'wait_for_greeting': False,
             'block_interruptions': True,
@@ -413,11 +345,11 @@ async def make_call_using_bland(user_id: str, call_prompt: str, phone_number: st
         headers = {
             'Authorization': bland_api_key,
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url=url, json=payload, headers=headers)
-            print('response', response)
-            response.raise_for_status()
-            response_data = response.json()
+        client = http_clients.get('bland')
+        response = await client.post(url=url, json=payload, headers=headers)
+        print('response', response)
+        response.raise_for_status()
+        response_data = response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -435,20 +367,21 @@ async def schedule_bland_calls(bland_call_input: BlandCallInput):
         user_details = await users_collection.find_one({'user_id': user_id})
         if user_details is None:
             raise HTTPException(status_code=404, detail='User Details not found')
+        set_project(user_details.get('projectId'))
         for table in user_details['table_details']:
             if table['table_name'] == 'Team Members':
                 employee_table_id = table['table_id']
                 token = user_details['token']
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{user_details["projectId"]}/{employee_table_id}?page=1&page_size=1000000',
-                        headers={
-                            'x-server-key': env.web_server_secret,
-                            'Authorization': f'Bearer {token}',
-                        },
-                    )
-                    response.raise_for_status()
-                    users = response.json()
+                client = http_clients.get('data_service')
+                response = await client.get(
+                    f'{env.klot_data_service_url}/storage/{user_details["projectId"]}/{employee_table_id}?page=1&page_size=1000000',
+                    headers={
+                        'x-server-key': env.web_server_secret,
+                        'Authorization': f'Bearer {token}',
+                    },
+                )
+                response.raise_for_status()
+                users = response.json()
         for user in users['records']:
             print('users', user)
             task_goal = (
@@ -488,16 +421,9 @@ async def schedule_bland_calls(bland_call_input: BlandCallInput):
                     else None
                 )
                 if jira_connector_id is not None:
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(
-                            url=f'{env.klot_data_service_url}/actions/jira/config/{jira_connector_id}',
-                            headers={'x-server-key': env.web_server_secret},
-                        )
-                        response.raise_for_status()
-                        configuration = response.json()
-                        jira_config_data = configuration.get('config', {}).get(
-                            'config', {}
-                        )
+                    jira_config_data = await get_connector_config(
+                        'jira', jira_connector_id
+                    )
                     tickets_summary = await summarize_tickets(
                         n=n if n else 0,
                         email_id=employee_email,
@@ -562,21 +488,22 @@ async def schedule_calls(user_id: str, n: int):
         user_details = await users_collection.find_one({'user_id': user_id})
         if user_details is None:
             raise HTTPException(status_code=404, detail='User Details not found')
+        set_project(user_details.get('projectId'))
         for table in user_details['table_details']:
             if table['table_name'] == 'Team Members':
                 employee_table_id = table['table_id']
                 token = user_details['token']
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{user_details["projectId"]}/{employee_table_id}?page=1&page_size=1000000',
-                        headers={
-                            'x-server-key': env.web_server_secret,
-                            'Authorization': f'Bearer {token}',
-                        },
-                    )
-                    print('response', response)
-                    response.raise_for_status()
-                    users = response.json()
+                client = http_clients.get('data_service')
+                response = await client.get(
+                    f'{env.klot_data_service_url}/storage/{user_details["projectId"]}/{employee_table_id}?page=1&page_size=1000000',
+                    headers={
+                        'x-server-key': env.web_server_secret,
+                        'Authorization': f'Bearer {token}',
+                    },
+                )
+                print('response', response)
+                response.raise_for_status()
+                users = response.json()
         for user in users['records']:
             print('users', user)
             task_goal = user['task_goal']
@@ -590,16 +517,9 @@ async def schedule_calls(user_id: str, n: int):
             if task_goal is None:
                 jira_connector_id = user_details.get('jira_connector_id')
                 if jira_connector_id is not None:
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(
-                            url=f'{env.klot_data_service_url}/actions/jira/config/{jira_connector_id}',
-                            headers={'x-server-key': env.web_server_secret},
-                        )
-                        response.raise_for_status()
-                        configuration = response.json()
-                        jira_config_data = configuration.get('config', {}).get(
-                            'config', {}
-                        )
+                    jira_config_data = await get_connector_config(
+                        'jira', jira_connector_id
+                    )
                     tickets_summary = await summarize_tickets(
                         n=n,
                         email_id=employee_email,
@@ -700,19 +620,40 @@ class ConversationContent(BaseModel):
     user_id: str
 
 
+async def load_name_index(project_id: str, table_id: str, token: str) -> NameIndex:
+    """
+    Build the name index of a Team Members table from the data service.
+    """
+    client = http_clients.get('data_service')
+    response = await client.get(
+        f'{env.klot_data_service_url}/storage/{project_id}/{table_id}?page=1&page_size=1000000',
+        headers={
+            'x-server-key': env.web_server_secret,
+            'Authorization': f'Bearer {token}',
+        },
+    )
+    response.raise_for_status()
+    records = response.json()['records']
+    return NameIndex(user.get('displayName') for user in records)
+
+
 @router.post('/find/user')
 async def find_user(conversation: ConversationContent):
     try:
         print(conversation)
         conversation_content = conversation.conversation_content
         user_id = conversation.user_id
+        user_details = await users_collection.find_one({'user_id': user_id})
+        if user_details is None:
+            raise HTTPException(status_code=404, detail='User Details not found')
+        set_project(user_details.get('projectId'))
         conv_content = f"""
 
         you are a ai project manager, you have a conversation with the following details: {conversation_content},
         your task is to find the name of the user with whom the AI is talking to, return the name of the user if found as a string value if not found return null,
         return the output with name as string only, nothing else except name should be returned, do not mention anything else except the name of the user"""
         payload = {
-            'model': 'azure/gpt-4o',
+            **model_routing.payload('name_extraction'),
             'messages': [
                 {
                     'role': 'user',
@@ -720,81 +661,124 @@ async def find_user(conversation: ConversationContent):
                 },
             ],
         }
-        llm_caller = LLMCaller(payload)
+        llm_caller = LLMCaller(payload, cache=True)
         response = await llm_caller.llm_unstructured_completion()
         name = response.response
 
-        user_details = await users_collection.find_one({'user_id': user_id})
-        if user_details is None:
-            raise HTTPException(status_code=404, detail='User Details not found')
         for table in user_details['table_details']:
             if table['table_name'] == 'Team Members':
                 table_id = table['table_id']
-                token = user_details['token']
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{user_details["projectId"]}/{table_id}?page=1&page_size=1000000',
-                        headers={
-                            'x-server-key': env.web_server_secret,
-                            'Authorization': f'Bearer {token}',
+                index = await name_indexes.get_or_load(
+                    (user_details['projectId'], table_id),
+                    partial(
+                        load_name_index,
+                        user_details['projectId'],
+                        table_id,
+                        user_details['token'],
+                    ),
+                )
+                names, clear_match = pick_name(index.search(name))
+                if not names:
+                    raise HTTPException(status_code=404, detail='User not found')
+                if clear_match:
+                    return {'name': names[0]}
+
+                # Only tied candidates are left for the model to decide on
+                content = f"""
+
+                    you are a ai project manager, you have a list of users with the following details: {names},
+                    your task is to find if the user is present in the list or not, if the user is present return the name of the user else return None,
+                    return the name of the user if any name matches with the {name} from the provided names
+                    return the full name matched with the names provided, returned the name exactly how it is there in the names provided which matched the name to provided name
+                    return the full name only as string value, nothing else except the name should be returned, do not mention anything else except the name of the user"""
+                payload = {
+                    **model_routing.payload('name_matching'),
+                    'messages': [
+                        {
+                            'role': 'user',
+                            'content': content,
                         },
-                    )
-                    response.raise_for_status()
-                    users = response.json()
-                    records = users['records']
-                    names = [user['displayName'] for user in records]
-                    content = f"""
-
-                        you are a ai project manager, you have a list of users with the following details: {names},
-                        your task is to find if the user is present in the list or not, if the user is present return the name of the user else return None,
-                        return the name of the user if any name matches with the {name} from the provided names
-                        return the full name matched with the names provided, returned the name exactly how it is there in the names provided which matched the name to provided name
-                        return the full name only as string value, nothing else except the name should be returned, do not mention anything else except the name of the user"""
-                    payload = {
-                        'model': 'azure/gpt-4o',
-                        'messages': [
-                            {
-                                'role': 'user',
-                                'content': content,
-                            },
-                        ],
-                    }
+                    ],
+                }
 
-                    llm_caller = LLMCaller(payload)
+                llm_caller = LLMCaller(payload, cache=True)
 
-                    response = await llm_caller.llm_unstructured_completion()
-                    name = response.response
-                    if name is None:
-                        raise HTTPException(status_code=404, detail='User not found')
-                    return {'name': name}
+                response = await llm_caller.llm_unstructured_completion()
+                name = response.response
+                if name is None:
+                    raise HTTPException(status_code=404, detail='User not found')
+                return {'name': name}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 'user id' followed by filler such as 'value', 'is' or ':' and then the id itself
+USER_ID_PATTERN = re.compile(
+    r'user[\s_-]*id(?:\s+(?:value|is|was|of)\b|\s*[:=])*\W*([A-Za-z0-9][\w\-.@]+[A-Za-z0-9])',
+    re.IGNORECASE,
+)
+
+
+def user_id_candidates(data: dict) -> list[str]:
+    """
+    Collect the user_id candidates of a Bland webhook without calling the model.
+
+    The id sent in the call metadata or request data comes first, then any value
+    following 'user id' in the call variables or summary. Candidates are in order
+    of reliability and still have to be matched against the stored users.
+    """
+    candidates = []
+    for source in ('metadata', 'request_data', 'variables'):
+        section = data.get(source)
+        if isinstance(section, dict) and section.get('user_id'):
+            candidates.append(str(section['user_id']))
+    for text in (json.dumps(data.get('variables') or {}), data.get('summary') or ''):
+        candidates.extend(USER_ID_PATTERN.findall(text))
+    return list(dict.fromkeys(candidates))
+
+
+async def resolve_user(data: dict) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Find the stored user a Bland webhook belongs to.
+
+    The candidates of user_id_candidates are looked up first; only when none of
+    them is a stored user is the model asked for the user_id.
+
+    Returns:
+        Tuple[Optional[str], Optional[dict]]: The user_id and the stored user
+        details, None when the user_id the model returned is not stored.
+    """
+    for candidate in user_id_candidates(data):
+        user_details = await users_collection.find_one({'user_id': candidate})
+        if user_details is not None:
+            return candidate, user_details
+
+    # Last resort, ask the model to find the user_id in the payload
+    content = f"""
+        based on the data {render(compact_call(data), prompt_budgets.call_webhook)}, find the value of user_id from the data, return the user_id as a string value, do not return anything else except the user_id, do not mention anything, just return the user_id value only
+        """
+    payload = {
+        **model_routing.payload('user_id_extraction'),
+        'messages': [
+            {
+                'role': 'user',
+                'content': content,
+            },
+        ],
+    }
+    llm_caller = LLMCaller(payload)
+    llm_response = await llm_caller.llm_unstructured_completion()
+    user_id = llm_response.response
+    return user_id, await users_collection.find_one({'user_id': user_id})
+
+
 @router.post('/update/conversation/history')
 async def history_received(request: Request):
     try:
         data = await request.json()
         # print("data", data)
-        content = f"""
-        based on the data {data}, find the value of user_id from the data, return the user_id as a string value, do not return anything else except the user_id, do not mention anything, just return the user_id value only
-        """
-        payload = {
-            'model': 'azure/gpt-4o',
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': content,
-                },
-            ],
-        }
-
-        llm_caller = LLMCaller(payload)
-
-        llm_response = await llm_caller.llm_unstructured_completion()
-        user_id = llm_response.response
+        user_id, user_details = await resolve_user(data)
         print('user_id', user_id)
-        user_details = await users_collection.find_one({'user_id': user_id})
         master_connector_id = (
             user_details.get('master_connector_id')
             if user_details is not None
@@ -818,67 +802,67 @@ async def history_received(request: Request):
         #             response.raise_for_status()
         #             configuration = response.json()
         projectID = user_details['projectId']
+        set_project(projectID)
         email_address_of_user = None
         history_table_id = None
         task_goal_of_user = None
+        client = http_clients.get('data_service')
         for table in user_details.get('table_details'):
             if table['table_name'] == 'Team Members':
                 table_id = table.get('table_id')
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
-                        headers={
-                            'x-server-key': env.web_server_secret,
-                            'Authorization': f'Bearer {token}',
-                        },
-                    )
-                    response.raise_for_status()
-                    users = response.json()
-                    records = users.get('records')
-                    for record in records:
-                        phone_number = record['phone_number']
-                        if (
-                            record['phone_number'] == f'+{phone_number}'
-                            or record['phone_number'] == f'{phone_number}'
-                        ):
-                            print('record found', record['displayName'])
-                            email_address_of_user = record['emailAddress']
-                            content = f"""
-                            based on the data {data['summary']}, find if the user has any update on the task, if the task is mentioned completed then return "done" else return "in progress" value as a string, return only "done" or "in progress" value only as per the summary of call provided, do not return anything else except the "done" or "in progress" value only
-                            """
-                            payload = {
-                                'model': 'azure/gpt-4o',
-                                'messages': [
-                                    {
-                                        'role': 'user',
-                                        'content': content,
-                                    },
-                                ],
-                            }
-
-                            llm_caller = LLMCaller(payload)
-
-                            inner_llm_response = (
-                                await llm_caller.llm_unstructured_completion()
-                            )
-                            task_response = inner_llm_response.response
-                            print('task_response', task_response)
-                            record_id = record['_id']
-                            record['last_call_summary'] = data.get('summary')
-                            record['task_status'] = task_response
-                            task_goal_of_user = record['task_goal']
-
-                            async with httpx.AsyncClient() as inner_client:
-                                inner_response = await inner_client.put(
-                                    f'{env.klot_data_service_url}/storage/{projectID}/{table_id}/{record_id}',
-                                    json=record,
-                                    headers={
-                                        'x-server-key': env.web_server_secret,
-                                        'Authorization': f'Bearer {user_details["token"]}',
-                                    },
-                                )
-                                inner_response.raise_for_status()
-                                inner_response.json()
+                response = await client.get(
+                    f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
+                    headers={
+                        'x-server-key': env.web_server_secret,
+                        'Authorization': f'Bearer {token}',
+                    },
+                )
+                response.raise_for_status()
+                users = response.json()
+                records = users.get('records')
+                for record in records:
+                    phone_number = record['phone_number']
+                    if (
+                        record['phone_number'] == f'+{phone_number}'
+                        or record['phone_number'] == f'{phone_number}'
+                    ):
+                        print('record found', record['displayName'])
+                        email_address_of_user = record['emailAddress']
+                        content = f"""
+                        based on the data {data['summary']}, find if the user has any update on the task, if the task is mentioned completed then return "done" else return "in progress" value as a string, return only "done" or "in progress" value only as per the summary of call provided, do not return anything else except the "done" or "in progress" value only
+                        """
+                        payload = {
+                            **model_routing.payload('task_status'),
+                            'messages': [
+                                {
+                                    'role': 'user',
+                                    'content': content,
+                                },
+                            ],
+                        }
+
+                        llm_caller = LLMCaller(payload)
+
+                        inner_llm_response = (
+                            await llm_caller.llm_unstructured_completion()
+                        )
+                        task_response = inner_llm_response.response
+                        print('task_response', task_response)
+                        record_id = record['_id']
+                        record['last_call_summary'] = data.get('summary')
+                        record['task_status'] = task_response
+                        task_goal_of_user = record['task_goal']
+
+                        inner_response = await client.put(
+                            f'{env.klot_data_service_url}/storage/{projectID}/{table_id}/{record_id}',
+                            json=record,
+                            headers={
+                                'x-server-key': env.web_server_secret,
+                                'Authorization': f'Bearer {user_details["token"]}',
+                            },
+                        )
+                        inner_response.raise_for_status()
+                        inner_response.json()
             if table['table_name'] == 'History':
                 history_table_id = table['table_id']
         if email_address_of_user is not None and history_table_id is not None:
@@ -910,23 +894,22 @@ async def history_received(request: Request):
             data['emailAddress'] = email_address_of_user
             data['task_goal'] = task_goal_of_user
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f'{env.klot_data_service_url}/storage/{projectID}/{history_table_id}',
-                    json=[data],
-                    headers={
-                        'x-server-key': env.web_server_secret,
-                        'Authorization': f'Bearer {token}',
-                    },
-                )
-                print('response', response)
-                response.raise_for_status()
-                response.json()
+            response = await client.post(
+                f'{env.klot_data_service_url}/storage/{projectID}/{history_table_id}',
+                json=[data],
+                headers={
+                    'x-server-key': env.web_server_secret,
+                    'Authorization': f'Bearer {token}',
+                },
+            )
+            print('response', response)
+            response.raise_for_status()
+            response.json()
         blocker_prompt = f"""
-        based on the data {data}, find if the user has any blocker, if the user has any blocker then return the full details of the blocker as a string value, else return None, do not return anything else except the detailed blocker constructed data value only, do not mention anything else except the detailed blocker constructed data value
+        based on the data {render(compact_call(data), prompt_budgets.call_webhook)}, find if the user has any blocker, if the user has any blocker then return the full details of the blocker as a string value, else return None, do not return anything else except the detailed blocker constructed data value only, do not mention anything else except the detailed blocker constructed data value
         """
         payload = {
-            'model': 'azure/gpt-4o',
+            **model_routing.payload('blocker_detection'),
             'messages': [
                 {
                     'role': 'user',
@@ -938,49 +921,48 @@ async def history_received(request: Request):
 
         blocker_llm_response = await llm_caller.llm_unstructured_completion()
         if blocker_llm_response.response not in ['None', 'null', '', None]:
-            async with httpx.AsyncClient() as client:
-                prompt = f"""
-                based on the data provided {blocker_llm_response.response}, generate a neat body of a email addressing as a AI project Manager named Mario, to send an email addressing the blocker to the user with detailed information of the blocker.
-                make sure the body is well constructed to format the email as a professional email, visible with neat spacing looks good and easy to read,
-                also have a clear structured crisp subject line to make it easy to read and understand the email.
-                return the output as dict containing fields
-                body - generated email body
-                subject - generated subject line
-                return the output as stringified json value of these fields in a dict, return only the stringified json value only, do not return anything else, do not mention anything, do not even mention json also, just return the stringified json value
-                """
-                payload = {
-                    'model': 'azure/gpt-4o',
-                    'messages': [
-                        {
-                            'role': 'user',
-                            'content': prompt,
-                        },
-                    ],
-                }
-                llm_caller = LLMCaller(payload)
-                response = await llm_caller.llm_unstructured_completion()
-                content = response.response
-                email = json.loads(content)
-                if email is not None:
-                    body = email['body']
-                    subject = email['subject']
-
-                    async with httpx.AsyncClient(timeout=600) as blocker_client:
-                        json_data = {'subject': subject, 'body': body}
-                        headers = {'x-server-key': env.web_server_secret}
-                        print('sending blocker mail to project manager')
-                        response = await blocker_client.post(
-                            f'{env.klot_data_service_url}/actions/notify_through_email/send/{notify_through_email_connector_id}',
-                            json=json_data,
-                            headers=headers,
-                        )
-                        response.raise_for_status()
-                    # prompt = f"send an email using notify through email send function with the data of the blocker {blocker_llm_response.response}"
-                    # json_data = {"goal": prompt}
-                    # response = await client.post(f"{env.klot_data_service_url}/actions/master/action_selector/{master_connector_id}", json=json_data, headers={"x-server-key": env.web_server_secret})
-                    # response.raise_for_status()
-                    # response_data = response.json()
-                    # print("response_data", response_data)
+            prompt = f"""
+            based on the data provided {blocker_llm_response.response}, generate a neat body of a email addressing as a AI project Manager named Mario, to send an email addressing the blocker to the user with detailed information of the blocker.
+            make sure the body is well constructed to format the email as a professional email, visible with neat spacing looks good and easy to read,
+            also have a clear structured crisp subject line to make it easy to read and understand the email.
+            return the output as dict containing fields
+            body - generated email body
+            subject - generated subject line
+            return the output as stringified json value of these fields in a dict, return only the stringified json value only, do not return anything else, do not mention anything, do not even mention json also, just return the stringified json value
+            """
+            payload = {
+                **model_routing.payload('email_draft'),
+                'messages': [
+                    {
+                        'role': 'user',
+                        'content': prompt,
+                    },
+                ],
+            }
+            llm_caller = LLMCaller(payload)
+            response = await llm_caller.llm_structured_completion(EmailDraft)
+            email = response.parsed
+            if email is not None:
+                body = email.body
+                subject = email.subject
+
+                blocker_client = http_clients.get('data_service')
+                json_data = {'subject': subject, 'body': body}
+                headers = {'x-server-key': env.web_server_secret}
+                print('sending blocker mail to project manager')
+                response = await blocker_client.post(
+                    f'{env.klot_data_service_url}/actions/notify_through_email/send/{notify_through_email_connector_id}',
+                    json=json_data,
+                    headers=headers,
+                    timeout=600,
+                )
+                response.raise_for_status()
+                # prompt = f"send an email using notify through email send function with the data of the blocker {blocker_llm_response.response}"
+                # json_data = {"goal": prompt}
+                # response = await client.post(f"{env.klot_data_service_url}/actions/master/action_selector/{master_connector_id}", json=json_data, headers={"x-server-key": env.web_server_secret})
+                # response.raise_for_status()
+                # response_data = response.json()
+                # print("response_data", response_data)
 
         return {'status': 'success'}
     except Exception as e:
@@ -1028,20 +1010,20 @@ async def get_email_history(history_input: HistoryInput):
         if user is None:
             raise HTTPException(status_code=404, detail='User not found')
         token = user['token']
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
-                headers={
-                    'x-server-key': env.web_server_secret,
-                    'Authorization': f'Bearer {token}',
-                },
-            )
-            response.raise_for_status()
-            users = response.json()
-            records = users.get('records')
-            history_records = [
-                record for record in records if record['emailAddress'] == email_id
-            ]
-            return history_records
+        client = http_clients.get('data_service')
+        response = await client.get(
+            f'{env.klot_data_service_url}/storage/{projectID}/{table_id}?page=1&page_size=1000000',
+            headers={
+                'x-server-key': env.web_server_secret,
+                'Authorization': f'Bearer {token}',
+            },
+        )
+        response.raise_for_status()
+        users = response.json()
+        records = users.get('records')
+        history_records = [
+            record for record in records if record['emailAddress'] == email_id
+        ]
+        return history_records
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
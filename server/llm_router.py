@@ -0,0 +1,36 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from server.common.authorization.helpers import system_call
+from server.common.authorization.model import AuthenticatedUser
+from server.config.llm_limits import llm_limiters
+from server.config.llm_usage import usage_report
+
+router = APIRouter()
+
+
+@router.get('/llm/limits')
+async def llm_limit_stats(_: AuthenticatedUser = Depends(system_call)):
+    """
+    Report the rate limit budget, queue depth and wait times per model.
+    """
+    try:
+        return llm_limiters.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get('/llm/usage')
+async def llm_usage_report(
+    hours: int = 24, _: AuthenticatedUser = Depends(system_call)
+):
+    """
+    Report LLM calls, token totals and p50/p95 latency per endpoint and project
+    over the last 'hours' hours.
+    """
+    try:
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+        return await usage_report(since)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
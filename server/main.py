@@ -5,10 +5,17 @@ from fastapi.middleware.cors import CORSMiddleware
 import env
 
 # from server.common.database.data_service_mongodb import client as data_service_mongodb
+from server.chat_history import history_compactor
 from server.common.database.mongodb import client as mongodb
+from server.common.database.redis import client as redis
+from server.common.http.clients import registry as http_clients
+from server.common.request_context import request_context_middleware
+from server.config.llm_cache import llm_cache
+from server.config.llm_usage import usage_writer
 from server.connector_router import router as connector_router
 from server.conversation import router as conversation_router
 from server.follow_up_router import router as follow_up_router
+from server.llm_router import router as llm_router
 
 # from server.common.database.table_mongodb import client as table_mongodb
 
@@ -16,6 +23,15 @@ app = FastAPI()
 
 app.add_event_handler('startup', mongodb.connect)
 app.add_event_handler('shutdown', mongodb.disconnect)
+app.add_event_handler('startup', http_clients.connect)
+app.add_event_handler('shutdown', http_clients.disconnect)
+app.add_event_handler('startup', redis.connect)
+app.add_event_handler('shutdown', redis.disconnect)
+app.add_event_handler('startup', llm_cache.create_indexes)
+app.add_event_handler('startup', usage_writer.start)
+app.add_event_handler('shutdown', usage_writer.stop)
+app.add_event_handler('startup', history_compactor.start)
+app.add_event_handler('shutdown', history_compactor.stop)
 # app.add_event_handler('startup', data_service_mongodb.connect)
 # app.add_event_handler('shutdown', data_service_mongodb.disconnect)
 # app.add_event_handler('startup', table_mongodb.connect)
@@ -24,6 +40,7 @@ app.add_event_handler('shutdown', mongodb.disconnect)
 app.include_router(connector_router)
 app.include_router(conversation_router)
 app.include_router(follow_up_router)
+app.include_router(llm_router)
 
 
 @app.get('/health_check')
@@ -31,6 +48,8 @@ async def health_check():
     return {'message': 'Hey Devops dude! I am alive!'}
 
 
+app.middleware('http')(request_context_middleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],  # List of origins, adjust as needed
@@ -0,0 +1,261 @@
+import json
+import logging
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import env
+from server.common.concurrency import aiter_items, gather_bounded, iter_bounded
+from server.common.jira.client import JiraClient
+from server.common.jira.issue_cache import get_issue_cached
+from server.common.prompt_compactor import compact_issue, render, render_issues
+from server.config.llm_cache import llm_cache
+from server.config.llm_caller import LLMCaller
+from server.config.llm_limits import estimate_tokens
+from server.config.model_routing import model_routing
+from server.config.prompt_budgets import prompt_budgets
+
+# Single-ticket replies meaning the ticket is fine, compared after normalizing
+NO_CONCERN_REPLIES = {'', 'none', 'null', 'nil', 'no concerns'}
+
+
+def concern_or_none(reply: Optional[str]) -> Optional[str]:
+    """
+    Map a model's "None" or "null" answer to None, keeping real concerns as is.
+    """
+    if reply is None:
+        return None
+    if reply.strip().strip('"\'`.').lower() in NO_CONCERN_REPLIES:
+        return None
+    return reply
+
+
+async def summarize_ticket(
+    ticket: dict, jira: Optional[JiraClient] = None
+) -> Optional[str]:
+    """
+    Ask the LLM for the concerns on a single ticket.
+
+    When a Jira client is given the full issue, including comments and worklogs,
+    is fetched first, or served from cache if it has not been updated since;
+    otherwise the ticket is used as provided. The issue is compacted to the
+    fields the review needs before prompting. Returns None when the model finds
+    no concern, like a null in a batch answer.
+    """
+    logging.debug('Summarizing ticket %s', ticket['key'])
+    issue = await get_issue_cached(jira, ticket) if jira is not None else ticket
+    content = f"""
+        you are a ai project manager, you have a ticket with the following details: {render(compact_issue(issue), prompt_budgets.ticket_review)},
+        your task is to find if the ticket is up to date , being updated by developer timely and if the ticket is being resolved in time also check the ticket status according to the comments made by the developer with considering the due date and the time of the ticket creation with time logs, if things are fine with ticket return None else return the concerns to be resolved as a string value"""
+    payload = {
+        **model_routing.payload('ticket_review'),
+        'messages': [
+            {
+                'role': 'user',
+                'content': content,
+            },
+        ],
+    }
+    llm_caller = LLMCaller(payload, cache=True)
+    response = await llm_caller.llm_unstructured_completion()
+    return concern_or_none(response.response)
+
+
+async def summarize_ticket_batch(issues: List[dict]) -> Dict[str, Optional[str]]:
+    """
+    Ask the LLM for the concerns on several tickets in a single completion.
+
+    Returns:
+        Dict[str, Optional[str]]: Concerns keyed by ticket key, None for tickets
+        that are fine. Keys the model left out or answered with something other
+        than a string or null are missing from the result.
+
+    Raises:
+        ValueError: If the completion is not a JSON object.
+    """
+    content = f"""
+        you are a ai project manager, you have the following tickets as a JSON list: {render_issues(issues, prompt_budgets.ticket_batch)},
+        for each ticket your task is to find if the ticket is up to date , being updated by developer timely and if the ticket is being resolved in time also check the ticket status according to the comments made by the developer with considering the due date and the time of the ticket creation with time logs,
+        return a JSON object mapping every ticket key to null if things are fine with the ticket else to the concerns to be resolved as a string value, do not return anything else except the JSON object"""
+    payload = {
+        **model_routing.payload('ticket_review'),
+        'messages': [
+            {
+                'role': 'user',
+                'content': content,
+            },
+        ],
+        'response_format': {'type': 'json_object'},
+    }
+    llm_caller = LLMCaller(payload, cache=True)
+    response = await llm_caller.llm_unstructured_completion()
+    try:
+        summaries = json.loads(response.response)
+    except (TypeError, json.JSONDecodeError) as e:
+        summaries = None
+        error = f'Batch summary is not valid JSON: {e}'
+    else:
+        error = 'Batch summary is not a JSON object'
+    if not isinstance(summaries, dict):
+        # Do not replay an unusable answer from cache on the next run
+        if llm_caller.cache_key is not None:
+            await llm_cache.invalidate(llm_caller.cache_key)
+        raise ValueError(error)
+    return {
+        issue['key']: summaries[issue['key']]
+        for issue in issues
+        if issue['key'] in summaries
+        and (
+            summaries[issue['key']] is None or isinstance(summaries[issue['key']], str)
+        )
+    }
+
+
+async def summarize_batch(issues: List[dict]) -> Dict[str, Optional[str]]:
+    """
+    Summarize a batch of tickets, splitting it when the answer cannot be used.
+
+    Tickets missing from a batch answer, or a whole batch whose answer does not
+    parse, are retried as two smaller batches. A single ticket falls back to the
+    one-ticket prompt.
+    """
+    if len(issues) == 1:
+        return {issues[0]['key']: await summarize_ticket(issues[0])}
+
+    try:
+        summaries = await summarize_ticket_batch(issues)
+    except ValueError as e:
+        logging.warning('Splitting a batch of %d tickets: %s', len(issues), e)
+        summaries = {}
+
+    missing = [issue for issue in issues if issue['key'] not in summaries]
+    if missing:
+        middle = (len(missing) + 1) // 2
+        for half in (missing[:middle], missing[middle:]):
+            if half:
+                summaries.update(await summarize_batch(half))
+    return summaries
+
+
+def issue_tokens(issue: dict) -> int:
+    """
+    Estimated prompt tokens of an issue as rendered in a batch prompt.
+    """
+    rendered = render(compact_issue(issue), prompt_budgets.ticket_batch)
+    return estimate_tokens([{'content': rendered}], {})
+
+
+async def pack_batches(
+    issues: AsyncIterable[Any], budget: int
+) -> AsyncIterator[List[dict]]:
+    """
+    Group issues in arrival order into batches whose estimated prompt stays within
+    the budget, yielding each batch as soon as the next issue would overflow it.
+
+    An issue larger than the budget on its own gets a batch of its own. Entries
+    that are not issues, such as failed fetches, are skipped.
+    """
+    batch: List[dict] = []
+    batch_tokens = 0
+    async for issue in issues:
+        if not isinstance(issue, dict):
+            continue
+        tokens = issue_tokens(issue)
+        if batch and batch_tokens + tokens > budget:
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(issue)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+async def collect_ticket_summaries(
+    tickets: Union[Iterable[dict], AsyncIterable[dict]],
+    jira: Optional[JiraClient] = None,
+    concurrency: int = env.ticket_summary_concurrency,
+    batching: bool = env.ticket_summary_batching,
+) -> Dict[str, str]:
+    """
+    Summarize the tickets concurrently and return the concerns keyed by ticket key.
+
+    At most `concurrency` tickets are summarized at once. Tickets streamed from an
+    async iterable start summarizing as they arrive. A ticket whose Jira fetch or
+    completion fails is logged and left out, and the remaining summaries keep the
+    order of the input tickets.
+
+    With batching on, the hydrated tickets are packed into prompts of up to
+    TICKET_SUMMARY_BATCH_TOKENS estimated tokens and summarized a batch per call,
+    each batch as soon as it is full.
+    """
+    if batching:
+        return await collect_batched_summaries(tickets, jira, concurrency)
+
+    async def summarize(ticket: dict) -> Tuple[str, Optional[str]]:
+        try:
+            return ticket['key'], await summarize_ticket(ticket, jira)
+        except Exception as e:
+            logging.warning('Could not summarize ticket %s: %s', ticket['key'], e)
+            return ticket['key'], None
+
+    results = await gather_bounded(tickets or [], summarize, concurrency)
+    return {
+        key: summary_of_ticket
+        for key, summary_of_ticket in results
+        if summary_of_ticket
+    }
+
+
+async def collect_batched_summaries(
+    tickets: Union[Iterable[dict], AsyncIterable[dict]],
+    jira: Optional[JiraClient],
+    concurrency: int,
+    budget: int = env.ticket_summary_batch_tokens,
+) -> Dict[str, str]:
+    """
+    Hydrate the tickets and summarize them in batches as they arrive.
+
+    Hydrated issues are packed by pack_batches, and a full batch is sent while
+    later tickets are still being fetched, with at most `concurrency` batch
+    completions in flight.
+    """
+    order: List[str] = []
+
+    async def arrivals() -> AsyncIterator[dict]:
+        async for ticket in aiter_items(tickets or []):
+            order.append(ticket['key'])
+            yield ticket
+
+    async def hydrate(ticket: dict) -> Optional[Dict[str, Any]]:
+        try:
+            return await get_issue_cached(jira, ticket) if jira is not None else ticket
+        except Exception as e:
+            logging.warning('Could not fetch ticket %s: %s', ticket['key'], e)
+            return None
+
+    async def summarize(batch: List[dict]) -> Dict[str, Optional[str]]:
+        try:
+            return await summarize_batch(batch)
+        except Exception as e:
+            logging.warning(
+                'Could not summarize tickets %s: %s',
+                [issue['key'] for issue in batch],
+                e,
+            )
+            return {}
+
+    hydrated = iter_bounded(arrivals(), hydrate, concurrency)
+    summaries: Dict[str, Optional[str]] = {}
+    async for result in iter_bounded(
+        pack_batches(hydrated, budget), summarize, concurrency
+    ):
+        summaries.update(result)
+    return {key: summaries[key] for key in order if summaries.get(key)}